@@ -1,1354 +1,1729 @@
-import json
-import logging
-import os
-from datetime import datetime, timedelta
-
-from telegram import (
-    Update,
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
-    KeyboardButton,
-    ReplyKeyboardMarkup,
-    ReplyKeyboardRemove,
-)
-from telegram.constants import ParseMode
-from telegram.ext import (
-    ApplicationBuilder,
-    CommandHandler,
-    CallbackQueryHandler,
-    MessageHandler,
-    ConversationHandler,
-    filters,
-    ContextTypes,
-)
-from sqlalchemy import (
-    Column,
-    Integer,
-    String,
-    DateTime,
-    ForeignKey,
-    Text,
-)
-from sqlalchemy.orm import relationship, declarative_base, sessionmaker
-from sqlalchemy import create_engine
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Configure logging
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
-logger = logging.getLogger(__name__)
-
-# Load configuration
-with open('config.json', 'r', encoding='utf-8') as f:
-    CONFIG = json.load(f)
-
-# Database setup
-Base = declarative_base()
-
-class TaskAssignment(Base):
-    __tablename__ = 'task_assignments'
-    task_id = Column(Integer, ForeignKey('tasks.id'), primary_key=True)
-    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
-    status = Column(String, default='Pending')  # 'Pending', 'Accepted', 'Completed'
-    task = relationship('Task', back_populates='assignments')
-    user = relationship('User', back_populates='assignments')
-
-class User(Base):
-    __tablename__ = 'users'
-    id = Column(Integer, primary_key=True)  # Telegram user ID
-    username = Column(String, nullable=True, index=True)  # Added username field
-    name = Column(String, nullable=False)
-    surname = Column(String, nullable=False)
-    phone_number = Column(String, unique=True, nullable=False)
-    role = Column(String, nullable=False)  # 'rector' or 'staff'
-    assignments = relationship('TaskAssignment', back_populates='user')
-    comments = relationship('Comment', back_populates='user')
-
-class Task(Base):
-    __tablename__ = 'tasks'
-    id = Column(Integer, primary_key=True)
-    title = Column(String, nullable=False)
-    description = Column(Text, nullable=False)
-    deadline = Column(DateTime, nullable=False)
-    notification_interval = Column(Integer, default=1)  # Interval in minutes before deadline
-    assignments = relationship('TaskAssignment', back_populates='task', cascade='all, delete-orphan')
-    comments = relationship('Comment', back_populates='task', cascade='all, delete-orphan')
-
-class Comment(Base):
-    __tablename__ = 'comments'
-    id = Column(Integer, primary_key=True)
-    task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    comment_text = Column(Text, nullable=False)
-    timestamp = Column(DateTime, nullable=False)
-    task = relationship('Task', back_populates='comments')
-    user = relationship('User', back_populates='comments')
-
-# Database connection
-DATABASE_URL = "sqlite:///task_manager.db"  # For production, use PostgreSQL or similar
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
-Base.metadata.create_all(bind=engine)
-
-# Initialize Scheduler
-scheduler = AsyncIOScheduler()
-scheduler.start()
-
-# Utility functions
-def get_user(session, user_id, update):
-    user = session.query(User).filter(User.id == user_id).first()
-    if user:
-        # Update username if it has changed
-        current_username = update.effective_user.username
-        if user.username != current_username:
-            user.username = current_username
-            session.commit()
-    return user
-
-def create_user(session, user_id, username, name, surname, phone_number, role):
-    if not username:
-        username = f"user_{user_id}"  # Assign a default username if None
-    user = User(id=user_id, username=username, name=name, surname=surname, phone_number=phone_number, role=role)
-    session.add(user)
-    session.commit()
-    logger.info(f"Created new user: {name} {surname}, ID: {user_id}, Role: {role}")
-    return user
-
-def create_task(session, title, description, deadline, notification_interval, assignee_ids):
-    task = Task(title=title, description=description, deadline=deadline, notification_interval=notification_interval)
-    session.add(task)
-    session.commit()  # Commit to get the task.id
-
-    for assignee_id in assignee_ids:
-        user = session.query(User).filter(User.id == assignee_id).first()
-        if user:
-            assignment = TaskAssignment(task_id=task.id, user_id=user.id)
-            session.add(assignment)
-    session.commit()
-    logger.info(f"Created new task: {title}, Assigned to: {assignee_ids}, Notification Interval: {notification_interval} minutes")
-    return task
-
-def add_comment(session, task_id, user_id, comment_text):
-    comment = Comment(task_id=task_id, user_id=user_id, comment_text=comment_text, timestamp=datetime.now())
-    session.add(comment)
-    session.commit()
-    logger.info(f"Added comment to task {task_id} by user {user_id}")
-    return comment
-
-def schedule_reminder(app, task_id, notification_interval):
-    """
-    Schedule reminders every `notification_interval` minutes or hours until the task is completed.
-    """
-    trigger = IntervalTrigger(
-        minutes=notification_interval,  # Change to 'hours=notification_interval' if needed
-        start_date=datetime.now() + timedelta(seconds=10),  # Start after 10 seconds
-    )
-    scheduler.add_job(send_reminder, trigger, args=[app, task_id], id=f"reminder_task_{task_id}", replace_existing=True)
-    logger.info(f"Scheduled reminders for task {task_id} every {notification_interval} minutes until completion")
-
-async def send_reminder(app, task_id):
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        logger.error(f"Task {task_id} not found for reminder.")
-        session.close()
-        return
-
-    # Check if the task is already completed
-    all_completed = all(assignment.status == "Completed" for assignment in task.assignments)
-    if all_completed:
-        # Remove the scheduled job since the task is completed
-        scheduler.remove_job(f"reminder_task_{task_id}")
-        logger.info(f"All assignments for task {task_id} are completed. Removed reminder job.")
-        session.close()
-        return
-
-    for assignment in task.assignments:
-        assignee = assignment.user
-        if assignment.status != "Completed":
-            message_text = CONFIG['reminder_message'].format(title=task.title, deadline=task.deadline.strftime('%Y-%m-%d %H:%M'))
-            try:
-                await app.bot.send_message(chat_id=assignee.id, text=message_text, parse_mode=ParseMode.MARKDOWN)
-                logger.info(f"Sent reminder to user {assignee.id} for task {task_id}.")
-            except Exception as e:
-                logger.error(f"Error sending reminder to user {assignee.id}: {e}")
-
-    session.close()
-
-async def notify_completion_if_all_completed(app, task_id):
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        logger.error(f"Task {task_id} not found for completion notification.")
-        session.close()
-        return
-
-    # Check if all assignments are completed
-    assignments = session.query(TaskAssignment).filter_by(task_id=task_id).all()
-    if not assignments:
-        logger.warning(f"No assignments found for task {task_id}.")
-        session.close()
-        return
-
-    if all(assignment.status == "Completed" for assignment in assignments):
-        # Remove the scheduled reminder job since the task is completed
-        try:
-            scheduler.remove_job(f"reminder_task_{task_id}")
-            logger.info(f"Removed reminder job for completed task {task_id}.")
-        except Exception as e:
-            logger.warning(f"No scheduled reminder job found for task {task_id}: {e}")
-
-        # Notify rector (or other relevant role)
-        rectors = session.query(User).filter(User.role == "rector").all()
-        if not rectors:
-            logger.warning("No rectors found to notify about task completion.")
-            session.close()
-            return
-
-        for rector in rectors:
-            try:
-                message_text = f"The task *{task.title}* has been completed by all assignees."
-                await app.bot.send_message(
-                    chat_id=rector.id, text=message_text, parse_mode="Markdown"
-                )
-                logger.info(f"Notified rector {rector.id} about task {task_id} completion.")
-            except Exception as e:
-                logger.error(f"Failed to notify rector {rector.id}: {e}")
-    else:
-        logger.info(f"Task {task_id} is not yet completed by all assignees.")
-
-    session.close()
-
-
-# Conversation States
-(
-    REGISTER_CONTACT,
-    REGISTER_NAME,
-    REGISTER_SURNAME,
-    REGISTER_ROLE,
-    RECTOR_TASK_TITLE,
-    RECTOR_TASK_DESCRIPTION,
-    RECTOR_TASK_DEADLINE,
-    RECTOR_TASK_NOTIFICATION_INTERVAL,
-    ASSIGNMENT_METHOD,
-    RECTOR_TASK_ASSIGNEE,
-    COMMENT_TASK,
-    EDIT_TASK_SELECTION,
-    EDIT_TASK_FIELD,
-    EDIT_TASK_VALUE,
-    CONFIRM_DELETE_TASK,
-) = range(15)  
-
-# Handlers
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    session = SessionLocal()
-    existing_user = get_user(session, user_id, update)
-    if existing_user:
-        # User is already registered; show appropriate menu
-        if existing_user.role == 'rector':
-            await show_rector_menu(update, context)
-        elif existing_user.role == 'staff':
-            await show_staff_menu(update, context)
-        else:
-            await update.message.reply_text("Your role is not recognized.")
-        logger.info(f"User {user_id} is already registered. Displayed {existing_user.role} menu.")
-    else:
-        # User is not registered; prompt for registration
-        keyboard = [
-            [InlineKeyboardButton(CONFIG['register_button'], callback_data="register")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(CONFIG['welcome_message'], reply_markup=reply_markup)
-        logger.info(f"User {user_id} is not registered. Prompted for registration.")
-    session.close()
-
-async def register(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    user_id = update.effective_user.id
-    session = SessionLocal()
-    existing_user = get_user(session, user_id, update)
-    if existing_user:
-        # User is already registered; show appropriate menu
-        await query.edit_message_text("You are already registered.", reply_markup=None)
-        if existing_user.role == 'rector':
-            await show_rector_menu(update, context)
-        elif existing_user.role == 'staff':
-            await show_staff_menu(update, context)
-        else:
-            await update.message.reply_text("Your role is not recognized.")
-        logger.info(f"User {user_id} is already registered. Displayed {existing_user.role} menu.")
-        session.close()
-        return ConversationHandler.END
-    else:
-        # User is not registered; proceed with registration
-        reply_markup = ReplyKeyboardMarkup(
-            [[KeyboardButton(CONFIG['share_phone_button'], request_contact=True)]],
-            one_time_keyboard=True,
-            resize_keyboard=True,
-        )
-        await query.edit_message_text("Please share your phone number using the button below.")
-        await update.effective_message.reply_text("Click the button to share your phone number.", reply_markup=reply_markup)
-        logger.info(f"User {user_id} initiated registration.")
-        session.close()
-        return REGISTER_CONTACT
-
-async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    contact = update.message.contact
-    phone_number = contact.phone_number
-    user_id = update.effective_user.id
-    logger.info(f"User {user_id} shared phone number: {phone_number}")
-
-    session = SessionLocal()
-    existing_user = session.query(User).filter(User.phone_number == phone_number).first()
-    if existing_user:
-        if existing_user.id == user_id:
-            # Phone number belongs to the user; show appropriate menu
-            await update.message.reply_text("You are already registered.", reply_markup=ReplyKeyboardRemove())
-            if existing_user.role == 'rector':
-                await show_rector_menu(update, context)
-            elif existing_user.role == 'staff':
-                await show_staff_menu(update, context)
-            else:
-                await update.message.reply_text("Your role is not recognized.")
-            logger.info(f"User {user_id} is already registered with this phone number.")
-        else:
-            # Phone number is registered to another user
-            await update.message.reply_text("This phone number is already registered to another user.", reply_markup=ReplyKeyboardRemove())
-            logger.warning(f"Phone number {phone_number} is already registered to a different user.")
-        session.close()
-        return ConversationHandler.END
-
-    context.user_data['phone_number'] = phone_number
-    await update.message.reply_text(CONFIG['enter_name_prompt'], parse_mode=ParseMode.MARKDOWN, reply_markup=ReplyKeyboardRemove())
-    logger.info(f"Prompted user {user_id} to enter name.")
-    session.close()
-    return REGISTER_NAME
-
-async def handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    name = update.message.text.strip()
-    if not name:
-        await update.message.reply_text("Name cannot be empty. Please enter your Name:")
-        logger.warning(f"User {update.effective_user.id} entered empty name.")
-        return REGISTER_NAME
-
-    context.user_data['name'] = name
-    await update.message.reply_text(CONFIG['enter_surname_prompt'], parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"User {update.effective_user.id} entered name: {name}")
-    return REGISTER_SURNAME
-
-async def handle_surname(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    surname = update.message.text.strip()
-    if not surname:
-        await update.message.reply_text("Surname cannot be empty. Please enter your Surname:")
-        logger.warning(f"User {update.effective_user.id} entered empty surname.")
-        return REGISTER_SURNAME
-
-    context.user_data['surname'] = surname
-    logger.info(f"User {update.effective_user.id} entered surname: {surname}")
-
-    # Prompt for role selection
-    keyboard = [
-        [InlineKeyboardButton(CONFIG['role_rector'], callback_data="role_rector")],
-        [InlineKeyboardButton(CONFIG['role_staff'], callback_data="role_staff")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(CONFIG['choose_role_prompt'], reply_markup=reply_markup)
-    logger.info(f"User {update.effective_user.id} prompted to choose role.")
-    return REGISTER_ROLE
-
-async def set_role(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    role = query.data.split("_")[1]
-    await query.answer()
-    logger.info(f"User {update.effective_user.id} selected role: {role}")
-
-    user_id = update.effective_user.id
-    username = update.effective_user.username  # Get the Telegram username
-    name = context.user_data.get('name')
-    surname = context.user_data.get('surname')
-    phone_number = context.user_data.get('phone_number')
-
-    session = SessionLocal()
-    existing_user = session.query(User).filter(User.id == user_id).first()
-    if existing_user:
-        # Update username if it has changed
-        if existing_user.username != username:
-            existing_user.username = username
-            session.commit()
-        await query.edit_message_text("You are already registered.", reply_markup=None)
-        logger.info(f"User {user_id} is already registered.")
-        if existing_user.role == 'rector':
-            await show_rector_menu(update, context)
-        elif existing_user.role == 'staff':
-            await show_staff_menu(update, context)
-        else:
-            await update.message.reply_text("Your role is not recognized.")
-        session.close()
-        return ConversationHandler.END
-
-    # Create user
-    user = create_user(session, user_id, username, name, surname, phone_number, role)
-
-    await query.edit_message_text(CONFIG['registration_success'].format(role=role.capitalize()))
-    logger.info(f"User {user_id} registration successful with role {role}.")
-    session.close()
-
-    # Show appropriate menu
-    if role == 'rector':
-        await show_rector_menu(update, context)
-    elif role == 'staff':
-        await show_staff_menu(update, context)
-
-    return ConversationHandler.END
-
-def export_user_data_to_txt(session, file_path="user_data.txt"):
-    try:
-        # Query all users
-        users = session.query(User).all()
-
-        if not users:
-            print("No user data found in the database.")
-            return False
-
-        # Write user data to a text file
-        with open(file_path, "w", encoding="utf-8") as file:
-            file.write(f"{'Username':<20}{'Phone Number':<20}{'Name':<20}{'Surname':<20}\n")
-            file.write("=" * 80 + "\n")
-
-            for user in users:
-                username = user.username or "N/A"
-                phone_number = user.phone_number
-                name = user.name
-                surname = user.surname
-                file.write(f"{username:<20}{phone_number:<20}{name:<20}{surname:<20}\n")
-
-        print(f"User data successfully exported to {file_path}")
-        return True
-
-    except Exception as e:
-        print(f"Error exporting user data: {e}")
-        return False
-
-# Add this command handler function
-async def export_users_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    session = SessionLocal()
-    user = session.query(User).filter(User.id == user_id).first()
-    if not user or user.role != 'rector':
-        await update.message.reply_text("You are not authorized to use this command.")
-        session.close()
-        return
-
-    file_path = "user_data.txt"
-    success = export_user_data_to_txt(session, file_path)
-    if success:
-        # Send the file to the user
-        with open(file_path, 'rb') as doc:
-            await update.message.reply_document(document=doc)
-        logger.info(f"User {user_id} exported user data.")
-    else:
-        await update.message.reply_text("Failed to export user data.")
-    session.close()
-
-async def show_rector_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [KeyboardButton("📋 Task List"), KeyboardButton("🆕 New Task")],
-        # [KeyboardButton("📂 Export Users")],  # Removed Export Users button
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    if update.callback_query:
-        await update.callback_query.message.reply_text(CONFIG['rector_menu'], parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    else:
-        await update.message.reply_text(CONFIG['rector_menu'], parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    logger.info(f"Displayed Rector menu to user {update.effective_user.id}.")
-
-async def show_staff_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    keyboard = [
-        [KeyboardButton("📋 All Tasks"), KeyboardButton("📝 My Tasks")],
-    ]
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    if update.callback_query:
-        await update.callback_query.message.reply_text(CONFIG['staff_menu'], parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    else:
-        await update.message.reply_text(CONFIG['staff_menu'], parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    logger.info(f"Displayed Staff menu to user {update.effective_user.id}.")
-
-async def rector_task_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    session = SessionLocal()
-    tasks = session.query(Task).all()
-
-    if not tasks:
-        task_text = CONFIG['no_tasks_available']
-        if update.message:
-            await update.message.reply_text(task_text)
-        elif update.callback_query:
-            await update.callback_query.message.edit_text(task_text)
-        session.close()
-        return
-
-    task_buttons = []
-    for task in tasks:
-        button = [InlineKeyboardButton(f"{task.title} (ID: {task.id})", callback_data=f"rector_task_{task.id}")]
-        task_buttons.append(button)
-
-    reply_markup = InlineKeyboardMarkup(task_buttons)
-    if update.message:
-        await update.message.reply_text("Select a task:", reply_markup=reply_markup)
-    elif update.callback_query:
-        await update.callback_query.message.edit_text("Select a task:", reply_markup=reply_markup)
-
-    session.close()
-
-async def rector_task_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    data = query.data
-    task_id = int(data.split("_")[2])
-
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        await query.edit_message_text("❌ Task not found.")
-        session.close()
-        return
-
-    # Gather assignees' info
-    assignees_info = ""
-    for assignment in task.assignments:
-        assignee = assignment.user
-        status = assignment.status
-        assignees_info += f"{assignee.name} {assignee.surname} - {status}\n"
-
-    # Gather comments
-    comments_text = ""
-    if task.comments:
-        comments_text = "\n*Comments:*\n"
-        for comment in task.comments:
-            commenter = comment.user
-            comments_text += f"- {commenter.name} {commenter.surname} [{comment.timestamp.strftime('%Y-%m-%d %H:%M')}]: {comment.comment_text}\n"
-
-    # Display notification interval
-    notification_interval = task.notification_interval
-    notification_text = f"*Notification Interval:* {notification_interval} minutes\n"
-
-    task_text = (
-        f"*ID:* {task.id}\n"
-        f"*Title:* {task.title}\n"
-        f"*Description:* {task.description}\n"
-        f"*Assignees:*\n{assignees_info}"
-        f"{notification_text}"
-        f"*Deadline:* {task.deadline.strftime('%Y-%m-%d %H:%M')}\n"
-        f"{comments_text}"
-    )
-
-    keyboard = [
-        [InlineKeyboardButton("✏️ Edit", callback_data=f"edit_task_{task.id}"),
-         InlineKeyboardButton("🗑️ Delete", callback_data=f"delete_task_{task.id}")],
-        [InlineKeyboardButton("🔔 Send Reminder", callback_data=f"remind_task_{task.id}")],
-        [InlineKeyboardButton("🔙 Back to Task List", callback_data="back_to_task_list")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(task_text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    session.close()
-
-async def rector_new_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.message:
-        await update.message.reply_text(CONFIG['create_task_prompt'], parse_mode=ParseMode.MARKDOWN)
-    else:
-        await update.callback_query.edit_message_text(CONFIG['create_task_prompt'], parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"Rector {update.effective_user.id} initiated new task creation.")
-    return RECTOR_TASK_TITLE
-
-async def handle_rector_task_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    title = update.message.text.strip()
-    if not title:
-        await update.message.reply_text("Title cannot be empty. Please enter the *Title* of the task:", parse_mode=ParseMode.MARKDOWN)
-        logger.warning(f"Rector {update.effective_user.id} entered empty task title.")
-        return RECTOR_TASK_TITLE
-
-    context.user_data['task_title'] = title
-    await update.message.reply_text("📄 Please enter the *Description* of the task:", parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"Rector {update.effective_user.id} entered task title: {title}")
-    return RECTOR_TASK_DESCRIPTION
-
-async def handle_rector_task_description(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    description = update.message.text.strip()
-    if not description:
-        await update.message.reply_text("Description cannot be empty. Please enter the *Description* of the task:", parse_mode=ParseMode.MARKDOWN)
-        logger.warning(f"Rector {update.effective_user.id} entered empty task description.")
-        return RECTOR_TASK_DESCRIPTION
-
-    context.user_data['task_description'] = description
-    await update.message.reply_text("⏰ Please enter the *Deadline* in the format `YYYY-MM-DD HH:MM` (e.g., 2024-12-31 23:59):", parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"Rector {update.effective_user.id} entered task description.")
-    return RECTOR_TASK_DEADLINE
-
-async def handle_rector_task_deadline(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    deadline_str = update.message.text.strip()
-    try:
-        deadline = datetime.strptime(deadline_str, "%Y-%m-%d %H:%M")
-    except ValueError:
-        await update.message.reply_text(CONFIG.get('invalid_deadline', "Invalid deadline format."), parse_mode=ParseMode.MARKDOWN)
-        logger.warning(f"Rector {update.effective_user.id} entered invalid deadline format: {deadline_str}")
-        return RECTOR_TASK_DEADLINE
-
-    context.user_data['task_deadline'] = deadline
-    await update.message.reply_text("⏰ Please enter the *Notification Interval* in minutes (e.g., 1):", parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"Rector {update.effective_user.id} entered task deadline: {deadline_str}")
-    return RECTOR_TASK_NOTIFICATION_INTERVAL
-
-async def handle_rector_task_notification_interval(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    interval_str = update.message.text.strip()
-    user_id = update.effective_user.id
-
-    if not interval_str.isdigit():
-        await update.message.reply_text(CONFIG.get('invalid_notification_interval', "❌ Please enter a valid number of minutes (e.g., 1)."))
-        logger.warning(f"Rector {user_id} entered invalid notification interval: {interval_str}")
-        return RECTOR_TASK_NOTIFICATION_INTERVAL
-
-    interval = int(interval_str)
-    if interval <= 0:
-        await update.message.reply_text(CONFIG.get('invalid_notification_interval', "❌ Notification interval must be a positive number of minutes."))
-        logger.warning(f"Rector {user_id} entered non-positive notification interval: {interval}")
-        return RECTOR_TASK_NOTIFICATION_INTERVAL
-
-    context.user_data['task_notification_interval'] = interval
-    logger.info(f"Rector {user_id} set notification interval: {interval} minutes")
-
-    await update.message.reply_text(CONFIG.get('notification_interval_set', "✅ Notification interval set successfully."))
-
-    # Proceed to assignment method
-    keyboard = [
-        [InlineKeyboardButton("📌 Assign to Someone", callback_data="assign_specific")],
-        [InlineKeyboardButton("🌐 Assign to All Staff", callback_data="assign_all")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await update.message.reply_text(CONFIG.get('choose_assignment_method', "Please choose assignment method:"), reply_markup=reply_markup)
-    return ASSIGNMENT_METHOD
-
-async def assign_staff_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-
-    staff_id = int(query.data.split("_")[2])
-    selected_staff_ids = context.user_data.get('selected_staff_ids', [])
-
-    if staff_id not in selected_staff_ids:
-        selected_staff_ids.append(staff_id)
-    else:
-        selected_staff_ids.remove(staff_id)
-
-    context.user_data['selected_staff_ids'] = selected_staff_ids
-
-    # Update the message with the current selection
-    session = SessionLocal()
-    staff = session.query(User).filter(User.id == staff_id).first()
-    session.close()
-
-    message_text = f"{staff.username or staff.name} {staff.surname} {'selected' if staff_id in selected_staff_ids else 'deselected'}"
-    await query.answer(message_text)
-
-async def set_assignment_method(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    choice = query.data
-    await query.answer()
-
-    if choice == "assign_specific":
-        session = SessionLocal()
-        staff_members = session.query(User).filter(User.role == 'staff').all()
-        session.close()
-
-        if not staff_members:
-            await query.edit_message_text("❌ No staff members found to assign the task.")
-            logger.error(f"No staff members found for task assignment by Rector {update.effective_user.id}.")
-            return ConversationHandler.END
-
-        # Create inline buttons for all staff usernames
-        buttons = [
-            [InlineKeyboardButton(f"{staff.username or staff.name} {staff.surname}", callback_data=f"assign_staff_{staff.id}")]
-            for staff in staff_members
-        ]
-        buttons.append([InlineKeyboardButton("✅ Confirm Selection", callback_data="assign_confirm")])
-        reply_markup = InlineKeyboardMarkup(buttons)
-
-        await query.edit_message_text("👤 Select staff members to assign the task:", reply_markup=reply_markup)
-        context.user_data['selected_staff_ids'] = []  # Initialize selected IDs
-        return RECTOR_TASK_ASSIGNEE
-
-    elif choice == "assign_all":
-        # Assign to all staff members
-        session = SessionLocal()
-        staff_members = session.query(User).filter(User.role == 'staff').all()
-        session.close()
-
-        if not staff_members:
-            await query.edit_message_text("❌ No staff members found to assign the task.")
-            return ConversationHandler.END
-
-        assignee_ids = [staff.id for staff in staff_members]
-        title = context.user_data.get('task_title')
-        description = context.user_data.get('task_description')
-        deadline = context.user_data.get('task_deadline')
-        notification_interval = context.user_data.get('task_notification_interval', 1)  # Default to 1 minute
-
-        task = create_task(session, title, description, deadline, notification_interval, assignee_ids)
-
-        # Schedule reminders based on notification_interval
-        schedule_reminder(context.application, task.id, notification_interval)
-
-        await query.edit_message_text(CONFIG['task_created'].format(title=title, assignee="All Staff Members"))
-        return ConversationHandler.END
-
-async def handle_rector_task_assignee(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    assignee_input = update.message.text.strip()
-    session = SessionLocal()
-
-    # Attempt to find user by username, ID, or full name
-    assignee = None
-    if assignee_input.startswith('@'):
-        username = assignee_input[1:]
-        assignee = session.query(User).filter(
-            User.username.ilike(username), User.role == 'staff'
-        ).first()
-    else:
-        try:
-            assignee_id = int(assignee_input)
-            assignee = session.query(User).filter(User.id == assignee_id, User.role == 'staff').first()
-        except ValueError:
-            # Try to search by name and surname
-            name_parts = assignee_input.split()
-            if len(name_parts) == 2:
-                first_name, last_name = name_parts
-                assignee = session.query(User).filter(
-                    User.name.ilike(first_name), User.surname.ilike(last_name), User.role == 'staff'
-                ).first()
-            else:
-                assignee = None
-
-    if not assignee:
-        await update.message.reply_text(
-            "❌ Assignee not found or not a staff member. Please enter a valid *Assignee's* Telegram username (e.g., @username), ID, or full name:",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        logger.warning(f"Rector {update.effective_user.id} entered invalid assignee: {assignee_input}")
-        session.close()
-        return RECTOR_TASK_ASSIGNEE
-
-    # Retrieve notification_interval
-    notification_interval = context.user_data.get('task_notification_interval', 1)  # Default to 1 minute
-
-    # Create the task and assign to the specific user
-    title = context.user_data.get('task_title')
-    description = context.user_data.get('task_description')
-    deadline = context.user_data.get('task_deadline')
-    task = create_task(session, title, description, deadline, notification_interval, [assignee.id])
-
-    # Schedule reminders based on notification_interval
-    schedule_reminder(context.application, task.id, notification_interval)
-
-    await update.message.reply_text(
-        CONFIG['task_created'].format(title=title, assignee=f"{assignee.name} {assignee.surname}"),
-        parse_mode=ParseMode.MARKDOWN
-    )
-    logger.info(f"Rector {update.effective_user.id} created task '{title}' assigned to {assignee.id} with notification interval {notification_interval} minutes")
-    session.close()
-
-    # Show Rector Menu
-    await show_rector_menu(update, context)
-    return ConversationHandler.END
-
-async def assign_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-
-    selected_staff_ids = context.user_data.get('selected_staff_ids', [])
-    if not selected_staff_ids:
-        await query.edit_message_text("❌ No staff members selected.")
-        return ConversationHandler.END
-
-    session = SessionLocal()
-    title = context.user_data.get('task_title')
-    description = context.user_data.get('task_description')
-    deadline = context.user_data.get('task_deadline')
-    notification_interval = context.user_data.get('task_notification_interval', 1)  # Default to 1 minute
-
-    task = create_task(session, title, description, deadline, notification_interval, selected_staff_ids)
-    session.close()
-
-    # Schedule reminders based on notification_interval
-    schedule_reminder(context.application, task.id, notification_interval)
-
-    await query.edit_message_text(CONFIG['task_created'].format(title=title, assignee="Selected Staff Members"))
-    return ConversationHandler.END
-
-async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if update.callback_query:
-        await update.callback_query.answer()
-        await update.callback_query.message.reply_text(CONFIG['operation_cancelled'], reply_markup=ReplyKeyboardRemove())
-    else:
-        await update.message.reply_text(CONFIG['operation_cancelled'], reply_markup=ReplyKeyboardRemove())
-    logger.info(f"User {update.effective_user.id} cancelled the operation.")
-    return ConversationHandler.END
-
-# Rector Edit Task Handlers
-async def edit_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    task_id = int(query.data.split("_")[2])
-    context.user_data['edit_task_id'] = task_id
-
-    keyboard = [
-        [InlineKeyboardButton("📝 Title", callback_data="edit_field_title")],
-        [InlineKeyboardButton("📄 Description", callback_data="edit_field_description")],
-        [InlineKeyboardButton("⏰ Deadline", callback_data="edit_field_deadline")],
-        [InlineKeyboardButton("🔔 Notification Interval", callback_data="edit_field_notification_interval")],  # New option
-        [InlineKeyboardButton("🔙 Back", callback_data=f"rector_task_{task_id}")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text("Select the field you want to edit:", reply_markup=reply_markup)
-    return EDIT_TASK_FIELD
-
-async def edit_task_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    field = query.data.split("_")[2]
-    context.user_data['edit_task_field'] = field
-
-    if field == 'notification_interval':
-        await query.edit_message_text("Please enter the new *Notification Interval* in minutes (e.g., 1):", parse_mode=ParseMode.MARKDOWN)
-    else:
-        await query.edit_message_text(f"Please enter the new value for *{field.capitalize()}*:", parse_mode=ParseMode.MARKDOWN)
-
-    return EDIT_TASK_VALUE
-
-async def edit_task_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    new_value = update.message.text.strip()
-    task_id = context.user_data.get('edit_task_id')
-    field = context.user_data.get('edit_task_field')
-
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        await update.message.reply_text("❌ Task not found.")
-        session.close()
-        return ConversationHandler.END
-
-    if field == 'title':
-        task.title = new_value
-    elif field == 'description':
-        task.description = new_value
-    elif field == 'deadline':
-        try:
-            task.deadline = datetime.strptime(new_value, "%Y-%m-%d %H:%M")
-        except ValueError:
-            await update.message.reply_text(CONFIG.get('invalid_deadline', "Invalid deadline format."), parse_mode=ParseMode.MARKDOWN)
-            logger.warning(f"Rector {update.effective_user.id} entered invalid deadline format: {new_value}")
-            session.close()
-            return EDIT_TASK_VALUE
-    elif field == 'notification_interval':
-        if not new_value.isdigit():
-            await update.message.reply_text("❌ Please enter a valid number of minutes (e.g., 1).")
-            logger.warning(f"Rector {update.effective_user.id} entered invalid notification interval: {new_value}")
-            session.close()
-            return EDIT_TASK_VALUE
-
-        interval = int(new_value)
-        if interval <= 0:
-            await update.message.reply_text("❌ Notification interval must be a positive number of minutes.")
-            logger.warning(f"Rector {update.effective_user.id} entered non-positive notification interval: {interval}")
-            session.close()
-            return EDIT_TASK_VALUE
-
-        task.notification_interval = interval
-        logger.info(f"Task {task_id} notification interval updated to {interval} minutes")
-
-        # Reschedule the reminder
-        try:
-            scheduler.remove_job(f"reminder_task_{task.id}")  # Remove existing job
-            logger.info(f"Removed existing reminder job for task {task.id} during edit.")
-        except Exception as e:
-            logger.warning(f"No existing reminder job found for task {task.id}: {e}")
-
-        schedule_reminder(context.application, task.id, interval)
-
-    else:
-        await update.message.reply_text("❌ Invalid field.")
-        session.close()
-        return ConversationHandler.END
-
-    session.commit()
-    await update.message.reply_text(f"✅ Task *{field.capitalize()}* updated successfully.", parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"Task {task_id} updated by Rector {update.effective_user.id}. Field: {field}, New Value: {new_value}")
-    session.close()
-
-    # Show Rector Menu
-    await show_rector_menu(update, context)
-    return ConversationHandler.END
-
-# Rector Delete Task Handlers
-async def delete_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    task_id = int(query.data.split("_")[2])
-    context.user_data['delete_task_id'] = task_id
-
-    keyboard = [
-        [InlineKeyboardButton("✅ Yes", callback_data="confirm_delete_task")],
-        [InlineKeyboardButton("❌ No", callback_data=f"rector_task_{task_id}")],
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text("Are you sure you want to delete this task?", reply_markup=reply_markup)
-    return CONFIRM_DELETE_TASK
-
-async def confirm_delete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    task_id = context.user_data.get('delete_task_id')
-
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        await query.edit_message_text("❌ Task not found.")
-        session.close()
-        return ConversationHandler.END
-
-    # Remove the scheduled reminder job if exists
-    try:
-        scheduler.remove_job(f"reminder_task_{task.id}")
-        logger.info(f"Removed reminder job for deleted task {task.id}.")
-    except Exception as e:
-        logger.warning(f"No scheduled reminder job found for task {task.id}: {e}")
-
-    session.delete(task)
-    session.commit()
-    await query.edit_message_text("🗑️ Task deleted successfully.")
-    logger.info(f"Task {task_id} deleted by Rector {update.effective_user.id}.")
-    session.close()
-
-    # Show Rector Menu
-    await show_rector_menu(update, context)
-    return ConversationHandler.END
-
-async def confirm_delete_after_completion(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    task_id = int(query.data.split("_")[2])
-
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        await query.edit_message_text("❌ Task not found.")
-        session.close()
-        return
-
-    # Remove the scheduled reminder job if exists
-    try:
-        scheduler.remove_job(f"reminder_task_{task.id}")
-        logger.info(f"Removed reminder job for deleted task {task.id}.")
-    except Exception as e:
-        logger.warning(f"No scheduled reminder job found for task {task.id}: {e}")
-
-    # Delete the task
-    session.delete(task)
-    session.commit()
-    await query.edit_message_text(f"🗑️ Task *{task.title}* has been deleted successfully.")
-    logger.info(f"Task {task_id} deleted by creator after completion.")
-    session.close()
-
-async def keep_task_after_completion(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    task_id = int(query.data.split("_")[2])
-
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        await query.edit_message_text("❌ Task not found.")
-        session.close()
-        return
-
-    await query.edit_message_text(f"✅ Task *{task.title}* has been retained.")
-    logger.info(f"Task {task_id} retained by creator after completion.")
-    session.close()
-
-# Rector Send Reminder
-async def send_reminder_to_assignees(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    task_id = int(query.data.split("_")[2])
-
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        await query.edit_message_text("❌ Task not found.")
-        session.close()
-        return
-
-    for assignment in task.assignments:
-        assignee = assignment.user
-        if assignment.status != "Completed":
-            message_text = CONFIG['reminder_message'].format(title=task.title, deadline=task.deadline.strftime('%Y-%m-%d %H:%M'))
-            try:
-                await context.application.bot.send_message(chat_id=assignee.id, text=message_text, parse_mode=ParseMode.MARKDOWN)
-                logger.info(f"Sent reminder to user {assignee.id} for task {task_id}.")
-            except Exception as e:
-                logger.error(f"Error sending reminder to user {assignee.id}: {e}")
-
-    await query.edit_message_text("🔔 Reminder sent to assignees.")
-    session.close()
-
-# Staff Handlers
-async def staff_all_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    session = SessionLocal()
-    tasks = session.query(Task).all()
-
-    if not tasks:
-        task_text = CONFIG['no_tasks_available']
-        if update.message:
-            await update.message.reply_text(task_text)
-        elif update.callback_query:
-            await update.callback_query.message.edit_text(task_text)
-        session.close()
-        return
-
-    task_buttons = []
-    for task in tasks:
-        button = [InlineKeyboardButton(f"{task.title} (ID: {task.id})", callback_data=f"staff_task_{task.id}")]
-        task_buttons.append(button)
-
-    reply_markup = InlineKeyboardMarkup(task_buttons)
-    if update.message:  # Case for message interactions
-        await update.message.reply_text("Select a task:", reply_markup=reply_markup)
-    elif update.callback_query:  # Case for callback interactions
-        await update.callback_query.message.edit_text("Select a task:", reply_markup=reply_markup)
-
-    session.close()
-
-async def staff_task_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-    data = query.data
-    task_id = int(data.split("_")[2])
-
-    session = SessionLocal()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    if not task:
-        await query.edit_message_text("❌ Task not found.")
-        session.close()
-        return
-
-    assignment = session.query(TaskAssignment).filter_by(task_id=task_id, user_id=update.effective_user.id).first()
-    if not assignment:
-        status = "Not Assigned"
-    else:
-        status = assignment.status
-
-    task_text = (
-        f"*ID:* {task.id}\n"
-        f"*Title:* {task.title}\n"
-        f"*Description:* {task.description}\n"
-        f"*Deadline:* {task.deadline.strftime('%Y-%m-%d %H:%M')}\n"
-        f"*Status:* {status}\n"
-    )
-
-    keyboard = []
-    if assignment:
-        keyboard.append([
-            InlineKeyboardButton("✅ Accept", callback_data=f"accept_task_{task.id}"),
-            InlineKeyboardButton("✔️ Complete", callback_data=f"complete_task_{task.id}"),
-        ])
-        keyboard.append([
-            InlineKeyboardButton("💬 Comment", callback_data=f"comment_task_{task.id}"),
-        ])
-    keyboard.append([InlineKeyboardButton("🔙 Back to Task List", callback_data="back_to_staff_task_list")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(task_text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
-    session.close()
-
-async def staff_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    user_id = update.effective_user.id
-    session = SessionLocal()
-    user = session.query(User).filter(User.id == user_id, User.role == 'staff').first()
-    if not user:
-        await update.message.reply_text("⚠️ User not found or not authorized.", parse_mode=ParseMode.MARKDOWN)
-        logger.warning(f"User {user_id} not found or not authorized as staff.")
-        session.close()
-        return
-
-    assignments = session.query(TaskAssignment).filter_by(user_id=user_id).all()
-
-    if not assignments:
-        task_text = CONFIG['no_tasks_assigned']
-        await update.message.reply_text(task_text)
-        session.close()
-        return
-
-    task_buttons = []
-    for assignment in assignments:
-        task = assignment.task
-        button = [InlineKeyboardButton(f"{task.title} (ID: {task.id})", callback_data=f"staff_task_{task.id}")]
-        task_buttons.append(button)
-
-    reply_markup = InlineKeyboardMarkup(task_buttons)
-    await update.message.reply_text("Select a task:", reply_markup=reply_markup)
-    session.close()
-
-async def accept_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-
-    data = query.data
-    task_id = int(data.split("_")[2])
-
-    session = SessionLocal()
-    user_id = update.effective_user.id
-
-    assignment = session.query(TaskAssignment).filter_by(task_id=task_id, user_id=user_id).first()
-    if not assignment:
-        await query.edit_message_text("⚠️ You are not assigned to this task.", parse_mode=ParseMode.MARKDOWN)
-        logger.warning(f"User {user_id} is not assigned to task {task_id}.")
-        session.close()
-        return
-
-    if assignment.status == 'Pending':
-        assignment.status = 'Accepted'
-        session.commit()
-        await query.edit_message_text(CONFIG['task_accepted'].format(title=assignment.task.title), parse_mode=ParseMode.MARKDOWN)
-        logger.info(f"Task {task_id} accepted by user {user_id}.")
-
-        # Show the staff member's tasks
-        await staff_my_tasks(update, context)
-    else:
-        await query.edit_message_text(CONFIG['task_already_accepted'].format(title=assignment.task.title), parse_mode=ParseMode.MARKDOWN)
-        logger.info(f"Task {task_id} already accepted by user {user_id}.")
-    session.close()
-
-async def complete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-
-    data = query.data
-    task_id = int(data.split("_")[2])
-
-    session = SessionLocal()
-    user_id = update.effective_user.id
-
-    assignment = session.query(TaskAssignment).filter_by(task_id=task_id, user_id=user_id).first()
-    if not assignment:
-        await query.edit_message_text("⚠️ You are not assigned to this task.", parse_mode="Markdown")
-        logger.warning(f"User {user_id} is not assigned to task {task_id}.")
-        session.close()
-        return
-
-    if assignment.status != "Completed":
-        assignment.status = "Completed"
-        session.commit()
-        await query.edit_message_text(f"✅ You have completed the task *{assignment.task.title}*.", parse_mode="Markdown")
-        logger.info(f"Task {task_id} completed by user {user_id}.")
-
-        # Notify if all assignees have completed
-        await notify_completion_if_all_completed(context.application, task_id)
-    else:
-        await query.edit_message_text(f"⚠️ Task *{assignment.task.title}* is already marked as completed.", parse_mode="Markdown")
-        logger.info(f"Task {task_id} already marked as completed by user {user_id}.")
-    session.close()
-
-async def comment_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    query = update.callback_query
-    await query.answer()
-
-    data = query.data
-    task_id = int(data.split("_")[2])
-
-    session = SessionLocal()
-    assignment = session.query(TaskAssignment).filter_by(task_id=task_id, user_id=update.effective_user.id).first()
-    if not assignment:
-        await query.edit_message_text("⚠️ You are not assigned to this task.", parse_mode=ParseMode.MARKDOWN)
-        logger.warning(f"User {update.effective_user.id} is not assigned to task {task_id}.")
-        session.close()
-        return ConversationHandler.END
-
-    context.user_data['comment_task_id'] = task_id
-    await query.message.reply_text(CONFIG['comment_prompt'], parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"User {update.effective_user.id} started commenting on task {task_id}.")
-    session.close()
-    return COMMENT_TASK
-
-async def handle_comment(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    comment_text = update.message.text.strip()
-    if not comment_text:
-        await update.message.reply_text("💬 Comment cannot be empty. Please enter your comment:")
-        logger.warning(f"User {update.effective_user.id} entered empty comment.")
-        return COMMENT_TASK
-
-    task_id = context.user_data.get('comment_task_id')
-    user_id = update.effective_user.id
-
-    session = SessionLocal()
-    assignment = session.query(TaskAssignment).filter_by(task_id=task_id, user_id=user_id).first()
-    if not assignment:
-        await update.message.reply_text("⚠️ You are not assigned to this task.", parse_mode=ParseMode.MARKDOWN)
-        logger.warning(f"User {user_id} is not assigned to task {task_id}.")
-        session.close()
-        return ConversationHandler.END
-
-    # Add the comment
-    comment = add_comment(session, task_id, user_id, comment_text)
-    await update.message.reply_text(CONFIG['comment_added'], parse_mode=ParseMode.MARKDOWN)
-    logger.info(f"User {user_id} added comment to task {task_id}.")
-
-    # Notify Rector(s)
-    rectors = session.query(User).filter(User.role == 'rector').all()
-    commenter = session.query(User).filter(User.id == user_id).first()
-    task = session.query(Task).filter(Task.id == task_id).first()
-    for rector in rectors:
-        message_text = f"💬 New comment on task *{task.title}* by {commenter.name} {commenter.surname}:\n\n{comment_text}"
-        try:
-            await context.application.bot.send_message(chat_id=rector.id, text=message_text, parse_mode=ParseMode.MARKDOWN)
-            logger.info(f"Sent comment notification to Rector {rector.id} for task {task_id}.")
-        except Exception as e:
-            logger.error(f"Error sending comment notification to Rector {rector.id}: {e}")
-
-    session.close()
-
-    return ConversationHandler.END
-
-# Main Function
-def main():
-    # Initialize the bot application
-    BOT_TOKEN = os.getenv("BOT_TOKEN")
-    if not BOT_TOKEN:
-        logger.error("Bot token not found. Please set the BOT_TOKEN environment variable.")
-        return
-
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
-
-    # Register /start command handler
-    app.add_handler(CommandHandler("start", start))
-
-    # Registration Conversation Handler
-    registration_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(register, pattern="^register$")],
-        states={
-            REGISTER_CONTACT: [MessageHandler(filters.CONTACT, handle_contact)],
-            REGISTER_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_name)],
-            REGISTER_SURNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_surname)],
-            REGISTER_ROLE: [CallbackQueryHandler(set_role, pattern="^role_.*")]
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
-    app.add_handler(registration_conv)
-
-    # Rector Task Creation Conversation Handler
-    rector_task_conv = ConversationHandler(
-        entry_points=[MessageHandler(filters.TEXT & filters.Regex("^🆕 New Task$"), rector_new_task)],
-        states={
-            RECTOR_TASK_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_title)],
-            RECTOR_TASK_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_description)],
-            RECTOR_TASK_DEADLINE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_deadline)],
-            RECTOR_TASK_NOTIFICATION_INTERVAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_notification_interval)],  # New handler
-            ASSIGNMENT_METHOD: [CallbackQueryHandler(set_assignment_method, pattern="^(assign_specific|assign_all)$")],
-            RECTOR_TASK_ASSIGNEE: [
-                CallbackQueryHandler(assign_staff_selection, pattern="^assign_staff_\\d+$"),
-                CallbackQueryHandler(assign_confirm, pattern="^assign_confirm$")
-            ],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
-    app.add_handler(rector_task_conv)
-
-    # Rector Edit Task Conversation Handler
-    edit_task_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(edit_task_start, pattern="^edit_task_\\d+$")],
-        states={
-            EDIT_TASK_FIELD: [CallbackQueryHandler(edit_task_field, pattern="^edit_field_.*$")],
-            EDIT_TASK_VALUE: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_task_value)],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
-    app.add_handler(edit_task_conv)
-
-    # Rector Delete Task Conversation Handler
-    delete_task_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(delete_task_start, pattern="^delete_task_\\d+$")],
-        states={
-            CONFIRM_DELETE_TASK: [CallbackQueryHandler(confirm_delete_task, pattern="^confirm_delete_task$")],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
-    app.add_handler(delete_task_conv)
-
-    # Comment Conversation Handler
-    comment_conv = ConversationHandler(
-        entry_points=[CallbackQueryHandler(comment_task_start, pattern="^comment_task_\\d+$")],
-        states={
-            COMMENT_TASK: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_comment)],
-        },
-        fallbacks=[CommandHandler("cancel", cancel)],
-    )
-    app.add_handler(comment_conv)
-
-    # Rector Task List Handler
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^📋 Task List$"), rector_task_list))
-    app.add_handler(CallbackQueryHandler(rector_task_action, pattern="^rector_task_\\d+$"))
-    app.add_handler(CallbackQueryHandler(lambda update, context: rector_task_list(update, context), pattern="^back_to_task_list$"))
-
-    # Rector Send Reminder Handler
-    app.add_handler(CallbackQueryHandler(send_reminder_to_assignees, pattern="^remind_task_\\d+$"))
-
-    # Staff All Tasks Handler
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^📋 All Tasks$"), staff_all_tasks))
-    app.add_handler(CallbackQueryHandler(staff_task_action, pattern="^staff_task_\\d+$"))
-    app.add_handler(CallbackQueryHandler(lambda update, context: staff_all_tasks(update, context), pattern="^back_to_staff_task_list$"))
-
-    # Staff My Tasks Handler
-    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^📝 My Tasks$"), staff_my_tasks))
-
-    # Accept Task Handler
-    app.add_handler(CallbackQueryHandler(accept_task, pattern="^accept_task_\\d+$"))
-
-    # Complete Task Handler
-    app.add_handler(CallbackQueryHandler(complete_task, pattern="^complete_task_\\d+$"))
-
-    # Comment Task Handler
-    app.add_handler(CallbackQueryHandler(comment_task_start, pattern="^comment_task_\\d+$"))
-
-    # Menu Handlers
-    app.add_handler(CallbackQueryHandler(show_rector_menu, pattern="^menu$"))
-    app.add_handler(CallbackQueryHandler(show_staff_menu, pattern="^menu$"))
-
-    # Confirm task deletion
-    app.add_handler(CallbackQueryHandler(confirm_delete_after_completion, pattern="^delete_task_\\d+_confirm$"))
-
-    # Retain the task
-    app.add_handler(CallbackQueryHandler(keep_task_after_completion, pattern="^keep_task_\\d+_confirm$"))
-
-    # Export Users Handler
-    app.add_handler(CommandHandler("export_users", export_users_handler))
-
-    # Start the bot
-    logger.info("Bot is running...")
-    print("Bot is running...")
-    app.run_polling()
-
-if __name__ == "__main__":
-    main()
-
-
-
-
-    ##
-
-
-
-
-
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import string
+import time
+from collections import deque
+from enum import IntEnum, auto
+from functools import lru_cache
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from telegram import (
+    Update,
+    InputFile,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+)
+from telegram.constants import ParseMode
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
+from telegram.ext import (
+    ApplicationBuilder,
+    CommandHandler,
+    CallbackQueryHandler,
+    MessageHandler,
+    ConversationHandler,
+    filters,
+    ContextTypes,
+)
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Text,
+    func,
+    case,
+    Index,
+    insert,
+    update,
+    or_,
+    and_,
+    select,
+    bindparam,
+)
+from sqlalchemy.orm import relationship, declarative_base, sessionmaker, selectinload, joinedload
+from sqlalchemy import create_engine, event
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+# Load configuration once and expose it as attributes so handlers do a
+# plain attribute fetch instead of re-hashing dict keys on every message.
+with open('config.json', 'r', encoding='utf-8') as f:
+    CONFIG = SimpleNamespace(**json.load(f))
+
+# str.format re-parses its template on every call. Compile each config
+# message with placeholders into a string.Template once at startup and
+# render through render_message() on the hot paths.
+_TEMPLATE_RE = re.compile(r'\{(\w+)\}')
+_TEMPLATES = {
+    key: string.Template(_TEMPLATE_RE.sub(r'${\1}', value))
+    for key, value in vars(CONFIG).items()
+    if isinstance(value, str) and _TEMPLATE_RE.search(value)
+}
+
+def render_message(key, **values):
+    # safe_substitute: an unknown placeholder in an edited config shows up
+    # literally in the message instead of raising mid-handler.
+    return _TEMPLATES[key].safe_substitute(values)
+
+# Database setup
+Base = declarative_base()
+
+class TaskAssignment(Base):
+    __tablename__ = 'task_assignments'
+    # Covers the completion-check aggregate (task_id + status filter) and
+    # the per-user "my tasks" listing; per-user point lookups ride the
+    # (task_id, user_id) composite primary key.
+    __table_args__ = (
+        Index('ix_ta_task_status', 'task_id', 'status'),
+        Index('ix_ta_user_status', 'user_id', 'status'),
+    )
+    task_id = Column(Integer, ForeignKey('tasks.id'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    status = Column(String, default='Pending')  # 'Pending', 'Accepted', 'Completed'
+    task = relationship('Task', back_populates='assignments')
+    user = relationship('User', back_populates='assignments')
+
+class User(Base):
+    __tablename__ = 'users'
+    # Role filters ('staff' fan-out, rector lookups) hit this constantly.
+    __table_args__ = (Index('ix_users_role', 'role'),)
+    id = Column(Integer, primary_key=True)  # Telegram user ID
+    username = Column(String, nullable=True, index=True)  # Added username field
+    name = Column(String, nullable=False)
+    surname = Column(String, nullable=False)
+    phone_number = Column(String, unique=True, nullable=False)
+    role = Column(String, nullable=False)  # 'rector' or 'staff'
+    assignments = relationship('TaskAssignment', back_populates='user')
+    comments = relationship('Comment', back_populates='user')
+
+# Functional indexes so the case-insensitive assignee lookup stays an
+# index seek instead of a per-row lower() scan.
+Index('ix_users_username_lower', func.lower(User.username))
+Index('ix_users_name_surname_lower', func.lower(User.name), func.lower(User.surname))
+
+class Task(Base):
+    __tablename__ = 'tasks'
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
+    description = Column(Text, nullable=False)
+    deadline = Column(DateTime, nullable=False)
+    notification_interval = Column(Integer, default=1)  # Interval in minutes before deadline
+    # When the reminder sweep should next ping this task; NULL means no
+    # reminders are due (all assignees done, or never scheduled).
+    next_reminder_at = Column(DateTime, nullable=True, index=True)
+    assignments = relationship('TaskAssignment', back_populates='task', cascade='all, delete-orphan')
+    comments = relationship('Comment', back_populates='task', cascade='all, delete-orphan')
+
+class Comment(Base):
+    __tablename__ = 'comments'
+    # task_id plus timestamp so the per-task comment listing is an ordered
+    # index walk rather than a filter-then-sort.
+    __table_args__ = (Index('ix_comments_task_ts', 'task_id', 'timestamp'),)
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, ForeignKey('tasks.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    comment_text = Column(Text, nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    task = relationship('Task', back_populates='comments')
+    user = relationship('User', back_populates='comments')
+
+# Database connection
+DATABASE_URL = "sqlite:///task_manager.db"  # For production, use PostgreSQL or similar
+# A real pool (instead of one shared connection) lets concurrent handler
+# threads read in parallel under WAL; pre_ping drops stale connections
+# before they surface as errors mid-handler.
+engine = create_engine(
+    DATABASE_URL,
+    echo=False,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    pool_size=10,
+    max_overflow=20,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    query_cache_size=1200,
+)
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_conn, connection_record):
+    # WAL keeps readers (task lists, reminders) from blocking on writer commits,
+    # and synchronous=NORMAL drops each commit to a single WAL append.
+    cursor = dbapi_conn.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+SessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+Base.metadata.create_all(bind=engine)
+
+# create_all never alters existing tables; bolt the sweep column onto
+# databases that predate it.
+with engine.connect() as _conn:
+    _cols = [row[1] for row in _conn.exec_driver_sql("PRAGMA table_info(tasks)")]
+    if 'next_reminder_at' not in _cols:
+        _conn.exec_driver_sql("ALTER TABLE tasks ADD COLUMN next_reminder_at DATETIME")
+        _conn.commit()
+
+# Initialize Scheduler. coalesce squashes a backlog of missed ticks into a
+# single run and max_instances stops a slow reminder fan-out from stacking
+# concurrent executions of the same job.
+scheduler = AsyncIOScheduler(
+    jobstores={'default': MemoryJobStore()},
+    job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 60},
+)
+scheduler.start()
+
+# Under steady write traffic SQLite may never find an idle moment to fold
+# the WAL back into the main file, so the log grows without bound; a
+# passive checkpoint every few minutes keeps it small without blocking
+# readers or writers.
+def _wal_checkpoint():
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+
+async def wal_checkpoint_job():
+    await asyncio.to_thread(_wal_checkpoint)
+
+scheduler.add_job(
+    wal_checkpoint_job,
+    trigger=IntervalTrigger(minutes=5),
+    id="wal_checkpoint",
+    replace_existing=True,
+)
+
+# Telegram allows roughly 30 messages per second across all chats. Keep
+# broadcast fan-outs below that with a semaphore plus a sliding-window
+# token bucket, and honor explicit RetryAfter back-offs from the API.
+SEND_RATE_LIMIT = 30  # messages per second
+_send_semaphore = asyncio.Semaphore(25)
+_send_timestamps = deque()
+
+async def _acquire_send_slot():
+    while True:
+        now = time.monotonic()
+        while _send_timestamps and now - _send_timestamps[0] >= 1.0:
+            _send_timestamps.popleft()
+        if len(_send_timestamps) < SEND_RATE_LIMIT:
+            _send_timestamps.append(now)
+            return
+        await asyncio.sleep(1.0 - (now - _send_timestamps[0]))
+
+async def send_rate_limited(bot, chat_id, text, parse_mode=ParseMode.MARKDOWN):
+    """Send one message under the global rate limit, retrying on 429."""
+    async with _send_semaphore:
+        while True:
+            await _acquire_send_slot()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                return True
+            except RetryAfter as e:
+                logger.warning("Rate limited by Telegram, retrying in %ss for chat %s.", e.retry_after, chat_id)
+                await asyncio.sleep(e.retry_after)
+            except Exception as e:
+                logger.error("Error sending message to chat %s: %s", chat_id, e)
+                return False
+
+# Rectors change rarely; cache their ids so completion notifications do
+# not re-scan the users table on every finished assignment.
+_rector_ids_cache = None
+
+def get_rector_ids(session):
+    global _rector_ids_cache
+    if _rector_ids_cache is None:
+        _rector_ids_cache = [row[0] for row in session.query(User.id).filter(User.role == 'rector')]
+    return _rector_ids_cache
+
+def invalidate_rector_cache():
+    global _rector_ids_cache
+    _rector_ids_cache = None
+
+# The staff roster backs every assignment keyboard; a short TTL keeps the
+# assign flow from re-scanning the users table on each opening while new
+# registrations still show up within half a minute.
+_STAFF_CACHE_TTL = 30
+_staff_cache = {'ts': 0.0, 'rows': []}
+
+def get_staff(session):
+    if time.monotonic() - _staff_cache['ts'] < _STAFF_CACHE_TTL:
+        return _staff_cache['rows']
+    rows = (
+        session.query(User.id, User.username, User.name, User.surname)
+        .filter(User.role == 'staff')
+        .all()
+    )
+    _staff_cache['rows'] = rows
+    _staff_cache['ts'] = time.monotonic()
+    return rows
+
+def invalidate_staff_cache():
+    _staff_cache['ts'] = 0.0
+
+# Every per-entity callback carries the numeric id last ("edit_task_7",
+# "assign_staff_42") bar the completion confirmations, which append a
+# "_confirm" suffix; one compiled regex replaces the split-and-index
+# dance and its throwaway list on each button press.
+_CB_ID_RE = re.compile(r'_(\d+)(?:_confirm)?$')
+
+def _callback_id(data):
+    return int(_CB_ID_RE.search(data).group(1))
+
+# Deadlines arrive as 'YYYY-MM-DD HH:MM'. Pre-screen with a compiled regex
+# so malformed input is rejected without exception control flow, then parse
+# through the C-implemented fromisoformat instead of strptime.
+_DEADLINE_RE = re.compile(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}$')
+
+def parse_deadline(text):
+    if not _DEADLINE_RE.match(text):
+        return None
+    try:
+        return datetime.fromisoformat(text.replace(' ', 'T'))
+    except ValueError:
+        return None
+
+# The same few deadlines are re-rendered on every task view and reminder;
+# memoizing skips strftime's per-call format-string parse.
+@lru_cache(maxsize=1024)
+def format_deadline(deadline):
+    return deadline.strftime('%Y-%m-%d %H:%M')
+
+# Utility functions
+# Pre-built statement for the hottest lookup; the engine's compiled cache
+# then serves it without re-constructing the Query each call.
+_GET_USER_STMT = select(User).where(User.id == bindparam('uid'))
+
+def get_user(session, user_id, current_username):
+    user = session.execute(_GET_USER_STMT, {'uid': user_id}).scalars().first()
+    if user and current_username and user.username != current_username:
+        # Username refreshes are cosmetic; queue them for the periodic batch
+        # flush instead of paying a write transaction per message.
+        _pending_username_updates[user_id] = current_username
+    return user
+
+# user id -> fresh username, drained by one executemany UPDATE every couple
+# of seconds; a /start flood then costs one transaction per flush instead
+# of one per user.
+_pending_username_updates = {}
+
+def _flush_username_updates():
+    if not _pending_username_updates:
+        return
+    batch = dict(_pending_username_updates)
+    _pending_username_updates.clear()
+    # Core executemany straight on the engine: one transaction, no ORM
+    # bookkeeping for what is a blind column refresh.
+    with engine.begin() as conn:
+        conn.execute(
+            update(User)
+            .where(
+                User.id == bindparam('b_id'),
+                # NULL-safe inequality: rows whose username already matches
+                # (e.g. queued from a stale read) are skipped at the engine
+                # level instead of being rewritten.
+                User.username.is_distinct_from(bindparam('b_username')),
+            )
+            .values(username=bindparam('b_username')),
+            [{'b_id': user_id, 'b_username': username} for user_id, username in batch.items()],
+        )
+
+async def flush_username_updates_job():
+    await asyncio.to_thread(_flush_username_updates)
+
+scheduler.add_job(
+    flush_username_updates_job,
+    IntervalTrigger(seconds=2),
+    id="username_flush",
+    replace_existing=True,
+)
+
+def fetch_user_role(user_id, current_username):
+    """Blocking role lookup; run via asyncio.to_thread from async handlers."""
+    with SessionLocal() as session:
+        user = get_user(session, user_id, current_username)
+        return user.role if user else None
+
+def create_user(session, user_id, username, name, surname, phone_number, role):
+    if not username:
+        username = f"user_{user_id}"  # Assign a default username if None
+    # Core insert: a one-shot write has no use for the ORM's flush and
+    # identity-map bookkeeping.
+    session.execute(
+        insert(User).values(
+            id=user_id,
+            username=username,
+            name=name,
+            surname=surname,
+            phone_number=phone_number,
+            role=role,
+        )
+    )
+    session.commit()
+    if role == 'rector':
+        invalidate_rector_cache()
+    elif role == 'staff':
+        invalidate_staff_cache()
+    logger.info("Created new user: %s %s, ID: %s, Role: %s", name, surname, user_id, role)
+    return user_id
+
+def create_task(session, title, description, deadline, notification_interval, assignee_ids):
+    """Insert a task plus its assignments; returns the new task id."""
+    task_id = session.execute(
+        insert(Task)
+        .values(
+            title=title,
+            description=description,
+            deadline=deadline,
+            notification_interval=notification_interval,
+            next_reminder_at=datetime.now() + timedelta(minutes=notification_interval),
+        )
+        .returning(Task.id)
+    ).scalar_one()
+
+    # Validate all assignees with one IN query and insert the assignment
+    # rows with a single executemany instead of a SELECT + add per id.
+    existing_ids = {row[0] for row in session.query(User.id).filter(User.id.in_(assignee_ids))}
+    if existing_ids:
+        session.execute(
+            insert(TaskAssignment),
+            [{"task_id": task_id, "user_id": user_id, "status": "Pending"} for user_id in existing_ids],
+        )
+    session.commit()
+    logger.info("Created new task: %s, Assigned to: %s, Notification Interval: %s minutes", title, assignee_ids, notification_interval)
+    return task_id
+
+def add_comment(session, task_id, user_id, comment_text):
+    comment = Comment(task_id=task_id, user_id=user_id, comment_text=comment_text, timestamp=datetime.now())
+    session.add(comment)
+    session.commit()
+    logger.info("Added comment to task %s by user %s", task_id, user_id)
+    return comment
+
+# A single periodic sweep replaces the old per-task interval jobs:
+# scheduler state stays O(1) and each tick costs one query no matter how
+# many tasks are live. Tasks opt in via next_reminder_at; completion or
+# deletion drops them out of the scan.
+REMINDER_SWEEP_SECONDS = 30
+
+def _due_reminder_batch():
+    """Collect (task id, message, chat ids) for every due task and bump next_reminder_at."""
+    now = datetime.now()
+    with SessionLocal() as session:
+        tasks = (
+            session.query(Task)
+            .options(selectinload(Task.assignments))
+            .filter(Task.next_reminder_at.isnot(None), Task.next_reminder_at <= now)
+            .all()
+        )
+        batch = []
+        for task in tasks:
+            pending = [a.user_id for a in task.assignments if a.status != 'Completed']
+            if not pending:
+                task.next_reminder_at = None
+                continue
+            batch.append((
+                task.id,
+                render_message('reminder_message', title=task.title, deadline=format_deadline(task.deadline)),
+                pending,
+            ))
+            task.next_reminder_at = now + timedelta(minutes=task.notification_interval)
+        session.commit()
+        return batch
+
+async def sweep_due_reminders(app):
+    batch = await asyncio.to_thread(_due_reminder_batch)
+    for task_id, message_text, chat_ids in batch:
+        results = await asyncio.gather(
+            *(send_rate_limited(app.bot, chat_id, message_text) for chat_id in chat_ids)
+        )
+        for chat_id, sent in zip(chat_ids, results):
+            if sent:
+                logger.info("Sent reminder to user %s for task %s.", chat_id, task_id)
+
+async def notify_all_completed(app, task_id, title):
+    # The caller observed remaining == 0 inside the same transaction as the
+    # status UPDATE, which also cleared next_reminder_at, so the sweep has
+    # already forgotten this task.
+
+    def _rectors():
+        with SessionLocal() as session:
+            return list(get_rector_ids(session))
+
+    rector_ids = await asyncio.to_thread(_rectors)
+    if not rector_ids:
+        logger.warning("No rectors found to notify about task completion.")
+        return
+
+    message_text = f"The task *{title}* has been completed by all assignees."
+    results = await asyncio.gather(
+        *(send_rate_limited(app.bot, rector_id, message_text) for rector_id in rector_ids)
+    )
+    for rector_id, sent in zip(rector_ids, results):
+        if sent:
+            logger.info("Notified rector %s about task %s completion.", rector_id, task_id)
+
+
+
+# Conversation States
+class State(IntEnum):
+    REGISTER_CONTACT = auto()
+    REGISTER_NAME = auto()
+    REGISTER_SURNAME = auto()
+    REGISTER_ROLE = auto()
+    RECTOR_TASK_TITLE = auto()
+    RECTOR_TASK_DESCRIPTION = auto()
+    RECTOR_TASK_DEADLINE = auto()
+    RECTOR_TASK_NOTIFICATION_INTERVAL = auto()
+    ASSIGNMENT_METHOD = auto()
+    RECTOR_TASK_ASSIGNEE = auto()
+    COMMENT_TASK = auto()
+    EDIT_TASK_SELECTION = auto()
+    EDIT_TASK_FIELD = auto()
+    EDIT_TASK_VALUE = auto()
+    CONFIRM_DELETE_TASK = auto()
+
+# Handlers
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    # Keep the event loop free while SQLite does its disk I/O.
+    role = await asyncio.to_thread(fetch_user_role, user_id, update.effective_user.username)
+    if role:
+        # User is already registered; show appropriate menu
+        context.user_data['role'] = role
+        if role == 'rector':
+            await show_rector_menu(update, context)
+        elif role == 'staff':
+            await show_staff_menu(update, context)
+        else:
+            await update.message.reply_text("Your role is not recognized.")
+        logger.info("User %s is already registered. Displayed %s menu.", user_id, role)
+    else:
+        # User is not registered; prompt for registration
+        keyboard = [
+            [InlineKeyboardButton(CONFIG.register_button, callback_data="register")],
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await update.message.reply_text(CONFIG.welcome_message, reply_markup=reply_markup)
+        logger.info("User %s is not registered. Prompted for registration.", user_id)
+
+async def register(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    user_id = update.effective_user.id
+    role = await asyncio.to_thread(fetch_user_role, user_id, update.effective_user.username)
+    if role:
+        # User is already registered; show appropriate menu
+        context.user_data['role'] = role
+        await query.edit_message_text("You are already registered.", reply_markup=None)
+        if role == 'rector':
+            await show_rector_menu(update, context)
+        elif role == 'staff':
+            await show_staff_menu(update, context)
+        else:
+            await update.message.reply_text("Your role is not recognized.")
+        logger.info("User %s is already registered. Displayed %s menu.", user_id, role)
+        return ConversationHandler.END
+    else:
+        # User is not registered; proceed with registration
+        reply_markup = ReplyKeyboardMarkup(
+            [[KeyboardButton(CONFIG.share_phone_button, request_contact=True)]],
+            one_time_keyboard=True,
+            resize_keyboard=True,
+        )
+        await query.edit_message_text("Please share your phone number using the button below.")
+        await update.effective_message.reply_text("Click the button to share your phone number.", reply_markup=reply_markup)
+        logger.info("User %s initiated registration.", user_id)
+        return State.REGISTER_CONTACT
+
+async def handle_contact(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    contact = update.message.contact
+    phone_number = contact.phone_number
+    user_id = update.effective_user.id
+    logger.info("User %s shared phone number: %s", user_id, phone_number)
+
+    def _lookup_phone_owner():
+        with SessionLocal() as session:
+            existing = session.query(User).filter(User.phone_number == phone_number).first()
+            return (existing.id, existing.role) if existing else None
+
+    owner = await asyncio.to_thread(_lookup_phone_owner)
+    if owner:
+        owner_id, owner_role = owner
+        if owner_id == user_id:
+            # Phone number belongs to the user; show appropriate menu
+            await update.message.reply_text("You are already registered.", reply_markup=ReplyKeyboardRemove())
+            if owner_role == 'rector':
+                await show_rector_menu(update, context)
+            elif owner_role == 'staff':
+                await show_staff_menu(update, context)
+            else:
+                await update.message.reply_text("Your role is not recognized.")
+            logger.info("User %s is already registered with this phone number.", user_id)
+        else:
+            # Phone number is registered to another user
+            await update.message.reply_text("This phone number is already registered to another user.", reply_markup=ReplyKeyboardRemove())
+            logger.warning("Phone number %s is already registered to a different user.", phone_number)
+        return ConversationHandler.END
+
+    context.user_data['phone_number'] = phone_number
+    await update.message.reply_text(CONFIG.enter_name_prompt, parse_mode=ParseMode.MARKDOWN, reply_markup=ReplyKeyboardRemove())
+    logger.info("Prompted user %s to enter name.", user_id)
+    return State.REGISTER_NAME
+
+async def handle_name(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    name = update.message.text.strip()
+    if not name:
+        await update.message.reply_text("Name cannot be empty. Please enter your Name:")
+        logger.warning("User %s entered empty name.", update.effective_user.id)
+        return State.REGISTER_NAME
+
+    context.user_data['name'] = name
+    await update.message.reply_text(CONFIG.enter_surname_prompt, parse_mode=ParseMode.MARKDOWN)
+    logger.info("User %s entered name: %s", update.effective_user.id, name)
+    return State.REGISTER_SURNAME
+
+async def handle_surname(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    surname = update.message.text.strip()
+    if not surname:
+        await update.message.reply_text("Surname cannot be empty. Please enter your Surname:")
+        logger.warning("User %s entered empty surname.", update.effective_user.id)
+        return State.REGISTER_SURNAME
+
+    context.user_data['surname'] = surname
+    logger.info("User %s entered surname: %s", update.effective_user.id, surname)
+
+    # Prompt for role selection
+    keyboard = [
+        [InlineKeyboardButton(CONFIG.role_rector, callback_data="role_rector")],
+        [InlineKeyboardButton(CONFIG.role_staff, callback_data="role_staff")],
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await update.message.reply_text(CONFIG.choose_role_prompt, reply_markup=reply_markup)
+    logger.info("User %s prompted to choose role.", update.effective_user.id)
+    return State.REGISTER_ROLE
+
+async def set_role(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    role = query.data.split("_")[1]
+    await query.answer()
+    logger.info("User %s selected role: %s", update.effective_user.id, role)
+
+    user_id = update.effective_user.id
+    username = update.effective_user.username  # Get the Telegram username
+    name = context.user_data.get('name')
+    surname = context.user_data.get('surname')
+    phone_number = context.user_data.get('phone_number')
+
+    with SessionLocal() as session:
+        existing_user = session.get(User, user_id)
+        if existing_user:
+            # Update username if it has changed
+            if username and existing_user.username != username:
+                _pending_username_updates[user_id] = username
+            context.user_data['role'] = existing_user.role
+            await query.edit_message_text("You are already registered.", reply_markup=None)
+            logger.info("User %s is already registered.", user_id)
+            if existing_user.role == 'rector':
+                await show_rector_menu(update, context)
+            elif existing_user.role == 'staff':
+                await show_staff_menu(update, context)
+            else:
+                await update.message.reply_text("Your role is not recognized.")
+            return ConversationHandler.END
+
+        # Create user
+        create_user(session, user_id, username, name, surname, phone_number, role)
+        context.user_data['role'] = role
+
+        await query.edit_message_text(render_message('registration_success', role=role.capitalize()))
+        logger.info("User %s registration successful with role %s.", user_id, role)
+
+        # Show appropriate menu
+        if role == 'rector':
+            await show_rector_menu(update, context)
+        elif role == 'staff':
+            await show_staff_menu(update, context)
+
+        return ConversationHandler.END
+
+def export_user_data_to_txt(session):
+    """Serialize the user table to a text report; returns bytes or None."""
+    try:
+        # Stream column tuples instead of materializing every User object;
+        # peak memory stays flat no matter how large the table grows.
+        rows = (
+            session.query(User.username, User.phone_number, User.name, User.surname)
+            .yield_per(500)
+        )
+
+        buffer = io.StringIO()
+        buffer.write(f"{'Username':<20}{'Phone Number':<20}{'Name':<20}{'Surname':<20}\n")
+        buffer.write("=" * 80 + "\n")
+
+        exported = 0
+        for username, phone_number, name, surname in rows:
+            buffer.write(f"{username or 'N/A':<20}{phone_number:<20}{name:<20}{surname:<20}\n")
+            exported += 1
+
+        if not exported:
+            logger.warning("No user data found in the database.")
+            return None
+
+        return buffer.getvalue().encode("utf-8")
+
+    except Exception as e:
+        logger.error("Error exporting user data: %s", e)
+        return None
+
+# Add this command handler function
+async def export_users_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+
+    # The role check and the full-table serialization both block; run them
+    # on a worker thread so a large export cannot freeze other handlers.
+    def _export():
+        with SessionLocal() as session:
+            role = session.query(User.role).filter(User.id == user_id).scalar()
+            if role != 'rector':
+                return 'unauthorized'
+            return export_user_data_to_txt(session)
+
+    data = await asyncio.to_thread(_export)
+    if data == 'unauthorized':
+        await update.message.reply_text("You are not authorized to use this command.")
+    elif data is not None:
+        # Send the in-memory buffer; no temp file or re-read from disk.
+        await update.message.reply_document(
+            document=InputFile(io.BytesIO(data), filename="user_data.txt")
+        )
+        logger.info("User %s exported user data.", user_id)
+    else:
+        await update.message.reply_text("Failed to export user data.")
+
+async def show_rector_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [
+        [KeyboardButton("📋 Task List"), KeyboardButton("🆕 New Task")],
+        # [KeyboardButton("📂 Export Users")],  # Removed Export Users button
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    if update.callback_query:
+        await update.callback_query.message.reply_text(CONFIG.rector_menu, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    else:
+        await update.message.reply_text(CONFIG.rector_menu, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    logger.info("Displayed Rector menu to user %s.", update.effective_user.id)
+
+async def show_staff_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    keyboard = [
+        [KeyboardButton("📋 All Tasks"), KeyboardButton("📝 My Tasks")],
+    ]
+    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    if update.callback_query:
+        await update.callback_query.message.reply_text(CONFIG.staff_menu, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    else:
+        await update.message.reply_text(CONFIG.staff_menu, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+    logger.info("Displayed Staff menu to user %s.", update.effective_user.id)
+
+async def show_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Single ^menu$ dispatcher; the role is cached per chat so repeat
+    # presses skip the DB lookup entirely.
+    role = context.user_data.get('role')
+    if role is None:
+        role = await asyncio.to_thread(
+            fetch_user_role, update.effective_user.id, update.effective_user.username
+        )
+        context.user_data['role'] = role
+    if role == 'rector':
+        await show_rector_menu(update, context)
+    else:
+        await show_staff_menu(update, context)
+
+# Telegram rejects oversized inline keyboards, so cap list renders.
+TASK_LIST_LIMIT = 500
+
+def _fetch_task_rows():
+    """Blocking (id, title) listing; run via asyncio.to_thread."""
+    with SessionLocal() as session:
+        return session.query(Task.id, Task.title).limit(TASK_LIST_LIMIT).all()
+
+async def rector_task_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    rows = await asyncio.to_thread(_fetch_task_rows)
+
+    if not rows:
+        task_text = CONFIG.no_tasks_available
+        if update.message:
+            await update.message.reply_text(task_text)
+        elif update.callback_query:
+            await update.callback_query.message.edit_text(task_text)
+        return
+
+    reply_markup = InlineKeyboardMarkup(
+        [
+            [InlineKeyboardButton(f"{title} (ID: {task_id})", callback_data=f"rector_task_{task_id}")]
+            for task_id, title in rows
+        ]
+    )
+    if update.message:
+        await update.message.reply_text("Select a task:", reply_markup=reply_markup)
+    elif update.callback_query:
+        await update.callback_query.message.edit_text("Select a task:", reply_markup=reply_markup)
+
+
+async def rector_task_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    data = query.data
+    task_id = _callback_id(data)
+
+    with SessionLocal() as session:
+        # Eager-load assignments, comments and their users so the detail view
+        # renders from a fixed number of SELECTs instead of one per row.
+        task = (
+            session.query(Task)
+            .options(
+                selectinload(Task.assignments).joinedload(TaskAssignment.user),
+                selectinload(Task.comments).joinedload(Comment.user),
+            )
+            .filter(Task.id == task_id)
+            .first()
+        )
+        if not task:
+            await query.edit_message_text("❌ Task not found.")
+            return
+
+        # Gather assignees' info and comments; join once instead of building
+        # the text with quadratic += concatenation.
+        assignees_info = "".join(
+            f"{assignment.user.name} {assignment.user.surname} - {assignment.status}\n"
+            for assignment in task.assignments
+        )
+
+        comments_text = ""
+        if task.comments:
+            comments_text = "\n*Comments:*\n" + "".join(
+                f"- {comment.user.name} {comment.user.surname} [{comment.timestamp.strftime('%Y-%m-%d %H:%M')}]: {comment.comment_text}\n"
+                for comment in task.comments
+            )
+
+        # Display notification interval
+        notification_interval = task.notification_interval
+        notification_text = f"*Notification Interval:* {notification_interval} minutes\n"
+
+        task_text = (
+            f"*ID:* {task.id}\n"
+            f"*Title:* {task.title}\n"
+            f"*Description:* {task.description}\n"
+            f"*Assignees:*\n{assignees_info}"
+            f"{notification_text}"
+            f"*Deadline:* {format_deadline(task.deadline)}\n"
+            f"{comments_text}"
+        )
+
+        keyboard = [
+            [InlineKeyboardButton("✏️ Edit", callback_data=f"edit_task_{task.id}"),
+             InlineKeyboardButton("🗑️ Delete", callback_data=f"delete_task_{task.id}")],
+            [InlineKeyboardButton("🔔 Send Reminder", callback_data=f"remind_task_{task.id}")],
+            [InlineKeyboardButton("🔙 Back to Task List", callback_data="back_to_task_list")],
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await query.edit_message_text(task_text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+async def rector_new_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.message:
+        await update.message.reply_text(CONFIG.create_task_prompt, parse_mode=ParseMode.MARKDOWN)
+    else:
+        await update.callback_query.edit_message_text(CONFIG.create_task_prompt, parse_mode=ParseMode.MARKDOWN)
+    logger.info("Rector %s initiated new task creation.", update.effective_user.id)
+    return State.RECTOR_TASK_TITLE
+
+async def handle_rector_task_title(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    title = update.message.text.strip()
+    if not title:
+        await update.message.reply_text("Title cannot be empty. Please enter the *Title* of the task:", parse_mode=ParseMode.MARKDOWN)
+        logger.warning("Rector %s entered empty task title.", update.effective_user.id)
+        return State.RECTOR_TASK_TITLE
+
+    context.user_data['task_title'] = title
+    await update.message.reply_text("📄 Please enter the *Description* of the task:", parse_mode=ParseMode.MARKDOWN)
+    logger.info("Rector %s entered task title: %s", update.effective_user.id, title)
+    return State.RECTOR_TASK_DESCRIPTION
+
+async def handle_rector_task_description(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    description = update.message.text.strip()
+    if not description:
+        await update.message.reply_text("Description cannot be empty. Please enter the *Description* of the task:", parse_mode=ParseMode.MARKDOWN)
+        logger.warning("Rector %s entered empty task description.", update.effective_user.id)
+        return State.RECTOR_TASK_DESCRIPTION
+
+    context.user_data['task_description'] = description
+    await update.message.reply_text("⏰ Please enter the *Deadline* in the format `YYYY-MM-DD HH:MM` (e.g., 2024-12-31 23:59):", parse_mode=ParseMode.MARKDOWN)
+    logger.info("Rector %s entered task description.", update.effective_user.id)
+    return State.RECTOR_TASK_DEADLINE
+
+async def handle_rector_task_deadline(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    deadline_str = update.message.text.strip()
+    deadline = parse_deadline(deadline_str)
+    if deadline is None:
+        await update.message.reply_text(getattr(CONFIG, 'invalid_deadline', "Invalid deadline format."), parse_mode=ParseMode.MARKDOWN)
+        logger.warning("Rector %s entered invalid deadline format: %s", update.effective_user.id, deadline_str)
+        return State.RECTOR_TASK_DEADLINE
+
+    context.user_data['task_deadline'] = deadline
+    await update.message.reply_text("⏰ Please enter the *Notification Interval* in minutes (e.g., 1):", parse_mode=ParseMode.MARKDOWN)
+    logger.info("Rector %s entered task deadline: %s", update.effective_user.id, deadline_str)
+    return State.RECTOR_TASK_NOTIFICATION_INTERVAL
+
+async def handle_rector_task_notification_interval(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    interval_str = update.message.text.strip()
+    user_id = update.effective_user.id
+
+    if not interval_str.isdigit():
+        await update.message.reply_text(getattr(CONFIG, 'invalid_notification_interval', "❌ Please enter a valid number of minutes (e.g., 1)."))
+        logger.warning("Rector %s entered invalid notification interval: %s", user_id, interval_str)
+        return State.RECTOR_TASK_NOTIFICATION_INTERVAL
+
+    interval = int(interval_str)
+    if interval <= 0:
+        await update.message.reply_text(getattr(CONFIG, 'invalid_notification_interval', "❌ Notification interval must be a positive number of minutes."))
+        logger.warning("Rector %s entered non-positive notification interval: %s", user_id, interval)
+        return State.RECTOR_TASK_NOTIFICATION_INTERVAL
+
+    context.user_data['task_notification_interval'] = interval
+    logger.info("Rector %s set notification interval: %s minutes", user_id, interval)
+
+    await update.message.reply_text(getattr(CONFIG, 'notification_interval_set', "✅ Notification interval set successfully."))
+
+    # Proceed to assignment method
+    keyboard = [
+        [InlineKeyboardButton("📌 Assign to Someone", callback_data="assign_specific")],
+        [InlineKeyboardButton("🌐 Assign to All Staff", callback_data="assign_all")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await update.message.reply_text(getattr(CONFIG, 'choose_assignment_method', "Please choose assignment method:"), reply_markup=reply_markup)
+    return State.ASSIGNMENT_METHOD
+
+async def assign_staff_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    # Deliberately not answering yet: a callback can only be answered once,
+    # and the toast below needs the selected user's name first.
+    staff_id = _callback_id(query.data)
+    selected_staff_ids = context.user_data.setdefault('selected_staff_ids', set())
+    selected_staff_ids.symmetric_difference_update({staff_id})
+
+    # The labels were cached when the selection keyboard was built, so a
+    # toggle normally touches no DB at all; fall back to one indexed
+    # column read if the cache was lost (e.g. bot restart mid-dialog).
+    label = context.user_data.get('staff_labels', {}).get(staff_id)
+    if label is None:
+        with SessionLocal() as session:
+            username, name, surname = session.query(User.username, User.name, User.surname).filter(User.id == staff_id).first()
+        label = f"{username or name} {surname}"
+
+    message_text = f"{label} {'selected' if staff_id in selected_staff_ids else 'deselected'}"
+    await query.answer(message_text)
+
+async def set_assignment_method(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    choice = query.data
+    await query.answer()
+
+    if choice == "assign_specific":
+        with SessionLocal() as session:
+            staff_members = get_staff(session)
+
+        if not staff_members:
+            await query.edit_message_text("❌ No staff members found to assign the task.")
+            logger.error("No staff members found for task assignment by Rector %s.", update.effective_user.id)
+            return ConversationHandler.END
+
+        # Create inline buttons for all staff usernames; keep the labels
+        # around so per-toggle callbacks can answer without a DB hit.
+        labels = {staff_id: f"{username or name} {surname}" for staff_id, username, name, surname in staff_members}
+        buttons = [
+            [InlineKeyboardButton(label, callback_data=f"assign_staff_{staff_id}")]
+            for staff_id, label in labels.items()
+        ]
+        buttons.append([InlineKeyboardButton("✅ Confirm Selection", callback_data="assign_confirm")])
+        reply_markup = InlineKeyboardMarkup(buttons)
+
+        await query.edit_message_text("👤 Select staff members to assign the task:", reply_markup=reply_markup)
+        context.user_data['staff_labels'] = labels
+        context.user_data['selected_staff_ids'] = set()  # Initialize selected IDs
+        return State.RECTOR_TASK_ASSIGNEE
+
+    elif choice == "assign_all":
+        # Assign to all staff members
+        with SessionLocal() as session:
+            assignee_ids = [row[0] for row in get_staff(session)]
+
+            if not assignee_ids:
+                await query.edit_message_text("❌ No staff members found to assign the task.")
+                return ConversationHandler.END
+
+            title = context.user_data.get('task_title')
+            description = context.user_data.get('task_description')
+            deadline = context.user_data.get('task_deadline')
+            notification_interval = context.user_data.get('task_notification_interval', 1)  # Default to 1 minute
+
+            task_id = create_task(session, title, description, deadline, notification_interval, assignee_ids)
+
+        await query.edit_message_text(render_message('task_created', title=title, assignee="All Staff Members"))
+        return ConversationHandler.END
+
+async def handle_rector_task_assignee(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    assignee_input = update.message.text.strip()
+    with SessionLocal() as session:
+
+        # Normalize the input once, then find the user by username, ID, or
+        # full name with a single OR-composed, index-friendly query.
+        predicates = []
+        if assignee_input.startswith('@'):
+            predicates.append(func.lower(User.username) == assignee_input[1:].lower())
+        else:
+            try:
+                predicates.append(User.id == int(assignee_input))
+            except ValueError:
+                name_parts = assignee_input.split()
+                if len(name_parts) == 2:
+                    first_name, last_name = name_parts
+                    predicates.append(and_(
+                        func.lower(User.name) == first_name.lower(),
+                        func.lower(User.surname) == last_name.lower(),
+                    ))
+
+        assignee = None
+        if predicates:
+            assignee = (
+                session.query(User)
+                .filter(User.role == 'staff', or_(*predicates))
+                .first()
+            )
+
+        if not assignee:
+            await update.message.reply_text(
+                "❌ Assignee not found or not a staff member. Please enter a valid *Assignee's* Telegram username (e.g., @username), ID, or full name:",
+                parse_mode=ParseMode.MARKDOWN
+            )
+            logger.warning("Rector %s entered invalid assignee: %s", update.effective_user.id, assignee_input)
+            return State.RECTOR_TASK_ASSIGNEE
+
+        # Retrieve notification_interval
+        notification_interval = context.user_data.get('task_notification_interval', 1)  # Default to 1 minute
+
+        # Create the task and assign to the specific user
+        title = context.user_data.get('task_title')
+        description = context.user_data.get('task_description')
+        deadline = context.user_data.get('task_deadline')
+        task_id = create_task(session, title, description, deadline, notification_interval, [assignee.id])
+
+        await update.message.reply_text(
+            render_message('task_created', title=title, assignee=f"{assignee.name} {assignee.surname}"),
+            parse_mode=ParseMode.MARKDOWN
+        )
+        logger.info("Rector %s created task '%s' assigned to %s with notification interval %s minutes", update.effective_user.id, title, assignee.id, notification_interval)
+
+        # Show Rector Menu
+        await show_rector_menu(update, context)
+        return ConversationHandler.END
+
+async def assign_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    selected_staff_ids = context.user_data.get('selected_staff_ids', [])
+    if not selected_staff_ids:
+        await query.edit_message_text("❌ No staff members selected.")
+        return ConversationHandler.END
+
+    with SessionLocal() as session:
+        title = context.user_data.get('task_title')
+        description = context.user_data.get('task_description')
+        deadline = context.user_data.get('task_deadline')
+        notification_interval = context.user_data.get('task_notification_interval', 1)  # Default to 1 minute
+
+        task_id = create_task(session, title, description, deadline, notification_interval, selected_staff_ids)
+
+        await query.edit_message_text(render_message('task_created', title=title, assignee="Selected Staff Members"))
+        return ConversationHandler.END
+
+async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.callback_query:
+        await update.callback_query.answer()
+        await update.callback_query.message.reply_text(CONFIG.operation_cancelled, reply_markup=ReplyKeyboardRemove())
+    else:
+        await update.message.reply_text(CONFIG.operation_cancelled, reply_markup=ReplyKeyboardRemove())
+    logger.info("User %s cancelled the operation.", update.effective_user.id)
+    return ConversationHandler.END
+
+# Rector Edit Task Handlers
+
+# Static rows of the edit-field keyboard; only the back button differs per
+# task, so the shared rows are built once at import time.
+_EDIT_FIELD_ROWS = [
+    [InlineKeyboardButton("📝 Title", callback_data="edit_field_title")],
+    [InlineKeyboardButton("📄 Description", callback_data="edit_field_description")],
+    [InlineKeyboardButton("⏰ Deadline", callback_data="edit_field_deadline")],
+    [InlineKeyboardButton("🔔 Notification Interval", callback_data="edit_field_notification_interval")],  # New option
+]
+
+async def edit_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    task_id = _callback_id(query.data)
+    context.user_data['edit_task_id'] = task_id
+
+    reply_markup = InlineKeyboardMarkup(
+        _EDIT_FIELD_ROWS + [[InlineKeyboardButton("🔙 Back", callback_data=f"rector_task_{task_id}")]]
+    )
+    await query.edit_message_text("Select the field you want to edit:", reply_markup=reply_markup)
+    return State.EDIT_TASK_FIELD
+
+async def edit_task_field(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    field = query.data.removeprefix("edit_field_")
+    context.user_data['edit_task_field'] = field
+
+    if field == 'notification_interval':
+        await query.edit_message_text("Please enter the new *Notification Interval* in minutes (e.g., 1):", parse_mode=ParseMode.MARKDOWN)
+    else:
+        await query.edit_message_text(f"Please enter the new value for *{field.capitalize()}*:", parse_mode=ParseMode.MARKDOWN)
+
+    return State.EDIT_TASK_VALUE
+
+async def edit_task_value(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    new_value = update.message.text.strip()
+    task_id = context.user_data.get('edit_task_id')
+    field = context.user_data.get('edit_task_field')
+
+    with SessionLocal() as session:
+        task = session.get(Task, task_id)
+        if not task:
+            await update.message.reply_text("❌ Task not found.")
+            return ConversationHandler.END
+
+        if field == 'title':
+            task.title = new_value
+        elif field == 'description':
+            task.description = new_value
+        elif field == 'deadline':
+            deadline = parse_deadline(new_value)
+            if deadline is None:
+                await update.message.reply_text(getattr(CONFIG, 'invalid_deadline', "Invalid deadline format."), parse_mode=ParseMode.MARKDOWN)
+                logger.warning("Rector %s entered invalid deadline format: %s", update.effective_user.id, new_value)
+                return State.EDIT_TASK_VALUE
+            task.deadline = deadline
+        elif field == 'notification_interval':
+            if not new_value.isdigit():
+                await update.message.reply_text("❌ Please enter a valid number of minutes (e.g., 1).")
+                logger.warning("Rector %s entered invalid notification interval: %s", update.effective_user.id, new_value)
+                return State.EDIT_TASK_VALUE
+
+            interval = int(new_value)
+            if interval <= 0:
+                await update.message.reply_text("❌ Notification interval must be a positive number of minutes.")
+                logger.warning("Rector %s entered non-positive notification interval: %s", update.effective_user.id, interval)
+                return State.EDIT_TASK_VALUE
+
+            task.notification_interval = interval
+            # Restart the cadence from now; the sweep picks the new interval
+            # up on its next pass.
+            task.next_reminder_at = datetime.now() + timedelta(minutes=interval)
+            logger.info("Task %s notification interval updated to %s minutes", task_id, interval)
+
+        else:
+            await update.message.reply_text("❌ Invalid field.")
+            return ConversationHandler.END
+
+        session.commit()
+        await update.message.reply_text(f"✅ Task *{field.capitalize()}* updated successfully.", parse_mode=ParseMode.MARKDOWN)
+        logger.info("Task %s updated by Rector %s. Field: %s, New Value: %s", task_id, update.effective_user.id, field, new_value)
+
+        # Show Rector Menu
+        await show_rector_menu(update, context)
+        return ConversationHandler.END
+
+# Rector Delete Task Handlers
+
+_DELETE_CONFIRM_ROWS = [
+    [InlineKeyboardButton("✅ Yes", callback_data="confirm_delete_task")],
+]
+
+async def delete_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    task_id = _callback_id(query.data)
+    context.user_data['delete_task_id'] = task_id
+
+    reply_markup = InlineKeyboardMarkup(
+        _DELETE_CONFIRM_ROWS + [[InlineKeyboardButton("❌ No", callback_data=f"rector_task_{task_id}")]]
+    )
+    await query.edit_message_text("Are you sure you want to delete this task?", reply_markup=reply_markup)
+    return State.CONFIRM_DELETE_TASK
+
+async def confirm_delete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    task_id = context.user_data.get('delete_task_id')
+
+    with SessionLocal() as session:
+        task = session.get(Task, task_id)
+        if not task:
+            await query.edit_message_text("❌ Task not found.")
+            return ConversationHandler.END
+
+        session.delete(task)
+        session.commit()
+        await query.edit_message_text("🗑️ Task deleted successfully.")
+        logger.info("Task %s deleted by Rector %s.", task_id, update.effective_user.id)
+
+        # Show Rector Menu
+        await show_rector_menu(update, context)
+        return ConversationHandler.END
+
+async def confirm_delete_after_completion(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    task_id = _callback_id(query.data)
+
+    with SessionLocal() as session:
+        task = session.get(Task, task_id)
+        if not task:
+            await query.edit_message_text("❌ Task not found.")
+            return
+
+        # Delete the task
+        session.delete(task)
+        session.commit()
+        await query.edit_message_text(f"🗑️ Task *{task.title}* has been deleted successfully.")
+        logger.info("Task %s deleted by creator after completion.", task_id)
+
+async def keep_task_after_completion(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    task_id = _callback_id(query.data)
+
+    with SessionLocal() as session:
+        task = session.get(Task, task_id)
+        if not task:
+            await query.edit_message_text("❌ Task not found.")
+            return
+
+        await query.edit_message_text(f"✅ Task *{task.title}* has been retained.")
+        logger.info("Task %s retained by creator after completion.", task_id)
+
+# Rector Send Reminder
+async def send_reminder_to_assignees(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    task_id = _callback_id(query.data)
+
+    with SessionLocal() as session:
+        # Pull the assignments and their users along with the task so the
+        # loop below never triggers per-assignee lazy loads.
+        task = (
+            session.query(Task)
+            .options(selectinload(Task.assignments).joinedload(TaskAssignment.user))
+            .filter(Task.id == task_id)
+            .first()
+        )
+        if not task:
+            await query.edit_message_text("❌ Task not found.")
+            return
+
+        message_text = render_message('reminder_message', title=task.title, deadline=format_deadline(task.deadline))
+        pending_ids = [a.user_id for a in task.assignments if a.status != "Completed"]
+
+    # Fan out concurrently instead of paying one round-trip per assignee;
+    # send_rate_limited keeps the burst under Telegram's ceiling.
+    results = await asyncio.gather(
+        *(send_rate_limited(context.application.bot, chat_id, message_text) for chat_id in pending_ids),
+        return_exceptions=True,
+    )
+    for chat_id, result in zip(pending_ids, results):
+        if isinstance(result, Exception):
+            logger.error("Error sending reminder to user %s: %s", chat_id, result)
+        else:
+            logger.info("Sent reminder to user %s for task %s.", chat_id, task_id)
+
+    await query.edit_message_text("🔔 Reminder sent to assignees.")
+
+# Staff Handlers
+
+# The task-list keyboard is identical for every staff member; keep the last
+# rendered markup keyed by the (id, title) rows so repeated opens of the
+# list skip rebuilding the button objects. Markup objects are immutable in
+# PTB, so sharing one instance across chats is safe.
+_staff_keyboard_cache = (None, None)
+
+def _staff_task_keyboard(rows):
+    global _staff_keyboard_cache
+    key = tuple(rows)
+    cached_key, cached_markup = _staff_keyboard_cache
+    if key != cached_key:
+        buttons = [
+            [InlineKeyboardButton(f"{title} (ID: {task_id})", callback_data=f"staff_task_{task_id}")]
+            for task_id, title in rows
+        ]
+        cached_markup = InlineKeyboardMarkup(buttons)
+        _staff_keyboard_cache = (key, cached_markup)
+    return cached_markup
+
+async def staff_all_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    with SessionLocal() as session:
+        # Column tuples only — the list view never needs hydrated Task objects.
+        rows = session.query(Task.id, Task.title).all()
+
+        if not rows:
+            task_text = CONFIG.no_tasks_available
+            if update.message:
+                await update.message.reply_text(task_text)
+            elif update.callback_query:
+                await update.callback_query.message.edit_text(task_text)
+            return
+
+        reply_markup = _staff_task_keyboard(rows)
+        if update.message:  # Case for message interactions
+            await update.message.reply_text("Select a task:", reply_markup=reply_markup)
+        elif update.callback_query:  # Case for callback interactions
+            await update.callback_query.message.edit_text("Select a task:", reply_markup=reply_markup)
+
+
+async def staff_task_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    data = query.data
+    task_id = _callback_id(data)
+
+    with SessionLocal() as session:
+        # One outer-join round-trip answers both questions: does the task
+        # exist, and what is this user's assignment status on it.
+        row = (
+            session.query(Task, TaskAssignment.status)
+            .outerjoin(
+                TaskAssignment,
+                and_(
+                    TaskAssignment.task_id == Task.id,
+                    TaskAssignment.user_id == update.effective_user.id,
+                ),
+            )
+            .filter(Task.id == task_id)
+            .first()
+        )
+        if row is None:
+            await query.edit_message_text("❌ Task not found.")
+            return
+
+        task, assignment_status = row
+        assignment = assignment_status is not None
+        status = assignment_status if assignment else "Not Assigned"
+
+        task_text = (
+            f"*ID:* {task.id}\n"
+            f"*Title:* {task.title}\n"
+            f"*Description:* {task.description}\n"
+            f"*Deadline:* {format_deadline(task.deadline)}\n"
+            f"*Status:* {status}\n"
+        )
+
+        keyboard = []
+        if assignment:
+            keyboard.append([
+                InlineKeyboardButton("✅ Accept", callback_data=f"accept_task_{task.id}"),
+                InlineKeyboardButton("✔️ Complete", callback_data=f"complete_task_{task.id}"),
+            ])
+            keyboard.append([
+                InlineKeyboardButton("💬 Comment", callback_data=f"comment_task_{task.id}"),
+            ])
+        keyboard.append([InlineKeyboardButton("🔙 Back to Task List", callback_data="back_to_staff_task_list")])
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        await query.edit_message_text(task_text, parse_mode=ParseMode.MARKDOWN, reply_markup=reply_markup)
+
+# Shared between the "My Tasks" view and the post-accept merged edit so
+# both render the identical keyboard from (id, title) tuples.
+def _my_tasks_rows(session, user_id):
+    return (
+        session.query(Task.id, Task.title)
+        .join(TaskAssignment, TaskAssignment.task_id == Task.id)
+        .filter(TaskAssignment.user_id == user_id)
+        .all()
+    )
+
+def _my_tasks_markup(rows):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"{title} (ID: {task_id})", callback_data=f"staff_task_{task_id}")]
+        for task_id, title in rows
+    ])
+
+async def staff_my_tasks(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = update.effective_user.id
+    # Role is cached at /start and registration; fall back to the DB only
+    # on a cache miss (e.g. first contact after a bot restart).
+    role = context.user_data.get('role')
+    with SessionLocal() as session:
+        if role is None:
+            role = session.query(User.role).filter(User.id == user_id).scalar()
+            if role:
+                context.user_data['role'] = role
+        if role != 'staff':
+            await update.message.reply_text("⚠️ User not found or not authorized.", parse_mode=ParseMode.MARKDOWN)
+            logger.warning("User %s not found or not authorized as staff.", user_id)
+            return
+
+        rows = _my_tasks_rows(session, user_id)
+
+        if not rows:
+            task_text = CONFIG.no_tasks_assigned
+            await update.message.reply_text(task_text)
+            return
+
+        await update.message.reply_text("Select a task:", reply_markup=_my_tasks_markup(rows))
+
+# Runs in a worker thread so the conditional UPDATE (and its fsync on
+# commit) never stalls the event loop. Returns plain data only — never
+# ORM objects — to keep identity maps from crossing threads:
+# ('updated' | 'repeat' | 'missing', task title, remaining).
+#
+# remaining is the count of not-yet-completed assignments, measured in
+# the same transaction as the UPDATE: two simultaneous completions cannot
+# both read a stale count, so exactly one caller sees remaining == 0.
+def _transition_assignment(task_id, user_id, new_status, only_from=None):
+    with SessionLocal() as session:
+        pending = session.query(TaskAssignment).filter_by(task_id=task_id, user_id=user_id)
+        if only_from is not None:
+            pending = pending.filter(TaskAssignment.status == only_from)
+        else:
+            pending = pending.filter(TaskAssignment.status != new_status)
+        updated = pending.update({'status': new_status}, synchronize_session=False)
+
+        remaining = None
+        if updated and new_status == 'Completed':
+            remaining = (
+                session.query(func.count(TaskAssignment.user_id))
+                .filter(TaskAssignment.task_id == task_id, TaskAssignment.status != 'Completed')
+                .scalar()
+            )
+            if remaining == 0:
+                # Stop the reminder sweep from ever picking the task up again.
+                session.query(Task).filter(Task.id == task_id).update(
+                    {'next_reminder_at': None}, synchronize_session=False
+                )
+        session.commit()
+
+        if not updated:
+            status = session.query(TaskAssignment.status).filter_by(task_id=task_id, user_id=user_id).scalar()
+            if status is None:
+                return 'missing', None, None
+        title = session.query(Task.title).filter(Task.id == task_id).scalar()
+        return ('updated' if updated else 'repeat'), title, remaining
+
+async def accept_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    task_id = _callback_id(query.data)
+    user_id = update.effective_user.id
+
+    outcome, title, _ = await asyncio.to_thread(
+        _transition_assignment, task_id, user_id, 'Accepted', 'Pending'
+    )
+
+    if outcome == 'missing':
+        await query.edit_message_text("⚠️ You are not assigned to this task.", parse_mode=ParseMode.MARKDOWN)
+        logger.warning("User %s is not assigned to task %s.", user_id, task_id)
+    elif outcome == 'updated':
+        logger.info("Task %s accepted by user %s.", task_id, user_id)
+
+        # Edit the confirmation and the refreshed task list into the same
+        # message instead of following up with a second send.
+        def _my_rows():
+            with SessionLocal() as session:
+                return _my_tasks_rows(session, user_id)
+
+        rows = await asyncio.to_thread(_my_rows)
+        text = render_message('task_accepted', title=title)
+        if rows:
+            await query.edit_message_text(
+                f"{text}\n\nSelect a task:",
+                parse_mode=ParseMode.MARKDOWN,
+                reply_markup=_my_tasks_markup(rows),
+            )
+        else:
+            await query.edit_message_text(text, parse_mode=ParseMode.MARKDOWN)
+    else:
+        await query.edit_message_text(render_message('task_already_accepted', title=title), parse_mode=ParseMode.MARKDOWN)
+        logger.info("Task %s already accepted by user %s.", task_id, user_id)
+
+async def complete_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    task_id = _callback_id(query.data)
+    user_id = update.effective_user.id
+
+    outcome, title, remaining = await asyncio.to_thread(
+        _transition_assignment, task_id, user_id, 'Completed'
+    )
+
+    if outcome == 'missing':
+        await query.edit_message_text("⚠️ You are not assigned to this task.", parse_mode="Markdown")
+        logger.warning("User %s is not assigned to task %s.", user_id, task_id)
+    elif outcome == 'repeat':
+        await query.edit_message_text(f"⚠️ Task *{title}* is already marked as completed.", parse_mode="Markdown")
+        logger.info("Task %s already marked as completed by user %s.", task_id, user_id)
+    else:
+        await query.edit_message_text(f"✅ You have completed the task *{title}*.", parse_mode="Markdown")
+        logger.info("Task %s completed by user %s.", task_id, user_id)
+
+        # Notify if all assignees have completed; remaining was measured in
+        # the UPDATE's own transaction, so no second check is needed.
+        if remaining == 0:
+            await notify_all_completed(context.application, task_id, title)
+
+async def comment_task_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+
+    data = query.data
+    task_id = _callback_id(data)
+
+    with SessionLocal() as session:
+        assigned = session.query(TaskAssignment.task_id).filter_by(task_id=task_id, user_id=update.effective_user.id).scalar()
+        if assigned is None:
+            await query.edit_message_text("⚠️ You are not assigned to this task.", parse_mode=ParseMode.MARKDOWN)
+            logger.warning("User %s is not assigned to task %s.", update.effective_user.id, task_id)
+            return ConversationHandler.END
+
+        context.user_data['comment_task_id'] = task_id
+        await query.message.reply_text(CONFIG.comment_prompt, parse_mode=ParseMode.MARKDOWN)
+        logger.info("User %s started commenting on task %s.", update.effective_user.id, task_id)
+        return State.COMMENT_TASK
+
+async def handle_comment(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    comment_text = update.message.text.strip()
+    if not comment_text:
+        await update.message.reply_text("💬 Comment cannot be empty. Please enter your comment:")
+        logger.warning("User %s entered empty comment.", update.effective_user.id)
+        return State.COMMENT_TASK
+
+    task_id = context.user_data.get('comment_task_id')
+    user_id = update.effective_user.id
+
+    # Authorization check, insert and notification payload in one thread
+    # hop; only plain strings and ids come back to the event loop.
+    def _record_comment():
+        with SessionLocal() as session:
+            assignment = (
+                session.query(TaskAssignment)
+                .options(joinedload(TaskAssignment.user), joinedload(TaskAssignment.task))
+                .filter_by(task_id=task_id, user_id=user_id)
+                .first()
+            )
+            if assignment is None:
+                return None
+            add_comment(session, task_id, user_id, comment_text)
+            # The rector-id cache spares the per-comment role scan.
+            rector_ids = list(get_rector_ids(session))
+            commenter = assignment.user
+            text = f"💬 New comment on task *{assignment.task.title}* by {commenter.name} {commenter.surname}:\n\n{comment_text}"
+            return text, rector_ids
+
+    payload = await asyncio.to_thread(_record_comment)
+    if payload is None:
+        await update.message.reply_text("⚠️ You are not assigned to this task.", parse_mode=ParseMode.MARKDOWN)
+        logger.warning("User %s is not assigned to task %s.", user_id, task_id)
+        return ConversationHandler.END
+
+    message_text, rector_ids = payload
+    await update.message.reply_text(CONFIG.comment_added, parse_mode=ParseMode.MARKDOWN)
+    logger.info("User %s added comment to task %s.", user_id, task_id)
+
+    results = await asyncio.gather(
+        *(send_rate_limited(context.application.bot, rector_id, message_text) for rector_id in rector_ids),
+        return_exceptions=True,
+    )
+    for rector_id, result in zip(rector_ids, results):
+        if isinstance(result, Exception):
+            logger.error("Error sending comment notification to Rector %s: %s", rector_id, result)
+        else:
+            logger.info("Sent comment notification to Rector %s for task %s.", rector_id, task_id)
+
+    return ConversationHandler.END
+
+# Main Function
+def main():
+    # Initialize the bot application
+    BOT_TOKEN = os.getenv("BOT_TOKEN")
+    if not BOT_TOKEN:
+        logger.error("Bot token not found. Please set the BOT_TOKEN environment variable.")
+        return
+
+    # Persistent pooled HTTP/2 client: burst fan-outs multiplex over kept-alive
+    # connections instead of paying a TLS handshake per reminder.
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .request(HTTPXRequest(connection_pool_size=50, http_version="2", pool_timeout=10))
+        .get_updates_request(HTTPXRequest(connection_pool_size=2, http_version="2"))
+        .concurrent_updates(True)
+        .build()
+    )
+
+    # Register /start command handler
+    app.add_handler(CommandHandler("start", start))
+
+    # Registration Conversation Handler
+    registration_conv = ConversationHandler(
+        entry_points=[CallbackQueryHandler(register, pattern="^register$")],
+        states={
+            State.REGISTER_CONTACT: [MessageHandler(filters.CONTACT, handle_contact)],
+            State.REGISTER_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_name)],
+            State.REGISTER_SURNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_surname)],
+            State.REGISTER_ROLE: [CallbackQueryHandler(set_role, pattern="^role_.*")]
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+    app.add_handler(registration_conv)
+
+    # Rector Task Creation Conversation Handler
+    rector_task_conv = ConversationHandler(
+        entry_points=[MessageHandler(filters.TEXT & filters.Regex("^🆕 New Task$"), rector_new_task)],
+        states={
+            State.RECTOR_TASK_TITLE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_title)],
+            State.RECTOR_TASK_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_description)],
+            State.RECTOR_TASK_DEADLINE: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_deadline)],
+            State.RECTOR_TASK_NOTIFICATION_INTERVAL: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_rector_task_notification_interval)],  # New handler
+            State.ASSIGNMENT_METHOD: [CallbackQueryHandler(set_assignment_method, pattern="^(assign_specific|assign_all)$")],
+            State.RECTOR_TASK_ASSIGNEE: [
+                CallbackQueryHandler(assign_staff_selection, pattern="^assign_staff_\\d+$"),
+                CallbackQueryHandler(assign_confirm, pattern="^assign_confirm$")
+            ],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+    app.add_handler(rector_task_conv)
+
+    # Rector Edit Task Conversation Handler
+    edit_task_conv = ConversationHandler(
+        entry_points=[CallbackQueryHandler(edit_task_start, pattern="^edit_task_\\d+$")],
+        states={
+            State.EDIT_TASK_FIELD: [CallbackQueryHandler(edit_task_field, pattern="^edit_field_.*$")],
+            State.EDIT_TASK_VALUE: [MessageHandler(filters.TEXT & ~filters.COMMAND, edit_task_value)],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+    app.add_handler(edit_task_conv)
+
+    # Rector Delete Task Conversation Handler
+    delete_task_conv = ConversationHandler(
+        entry_points=[CallbackQueryHandler(delete_task_start, pattern="^delete_task_\\d+$")],
+        states={
+            State.CONFIRM_DELETE_TASK: [CallbackQueryHandler(confirm_delete_task, pattern="^confirm_delete_task$")],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+    app.add_handler(delete_task_conv)
+
+    # Comment Conversation Handler
+    comment_conv = ConversationHandler(
+        entry_points=[CallbackQueryHandler(comment_task_start, pattern="^comment_task_\\d+$")],
+        states={
+            State.COMMENT_TASK: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_comment)],
+        },
+        fallbacks=[CommandHandler("cancel", cancel)],
+    )
+    app.add_handler(comment_conv)
+
+    # Rector Task List Handler
+    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^📋 Task List$"), rector_task_list))
+    app.add_handler(CallbackQueryHandler(rector_task_action, pattern="^rector_task_\\d+$"))
+    app.add_handler(CallbackQueryHandler(rector_task_list, pattern="^back_to_task_list$"))
+
+    # Rector Send Reminder Handler
+    app.add_handler(CallbackQueryHandler(send_reminder_to_assignees, pattern="^remind_task_\\d+$"))
+
+    # Staff All Tasks Handler
+    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^📋 All Tasks$"), staff_all_tasks))
+    app.add_handler(CallbackQueryHandler(staff_task_action, pattern="^staff_task_\\d+$"))
+    app.add_handler(CallbackQueryHandler(staff_all_tasks, pattern="^back_to_staff_task_list$"))
+
+    # Staff My Tasks Handler
+    app.add_handler(MessageHandler(filters.TEXT & filters.Regex("^📝 My Tasks$"), staff_my_tasks))
+
+    # Accept Task Handler
+    app.add_handler(CallbackQueryHandler(accept_task, pattern="^accept_task_\\d+$"))
+
+    # Complete Task Handler
+    app.add_handler(CallbackQueryHandler(complete_task, pattern="^complete_task_\\d+$"))
+
+    # Menu Handler; show_menu branches on the caller's role
+    app.add_handler(CallbackQueryHandler(show_menu, pattern="^menu$"))
+
+    # Confirm task deletion
+    app.add_handler(CallbackQueryHandler(confirm_delete_after_completion, pattern="^delete_task_\\d+_confirm$"))
+
+    # Retain the task
+    app.add_handler(CallbackQueryHandler(keep_task_after_completion, pattern="^keep_task_\\d+_confirm$"))
+
+    # Export Users Handler
+    app.add_handler(CommandHandler("export_users", export_users_handler))
+
+    # One recurring job drives every task's reminders.
+    scheduler.add_job(
+        sweep_due_reminders,
+        IntervalTrigger(seconds=REMINDER_SWEEP_SECONDS),
+        args=[app],
+        id="reminder_sweep",
+        replace_existing=True,
+    )
+
+    # Start the bot. With WEBHOOK_URL set, Telegram pushes updates straight
+    # to us and the getUpdates long-poll drops off the critical path;
+    # without it (local runs), fall back to polling.
+    logger.info("Bot is running...")
+    print("Bot is running...")
+    webhook_url = os.getenv("WEBHOOK_URL")
+    if webhook_url:
+        app.run_webhook(
+            listen="0.0.0.0",
+            port=int(os.getenv("PORT", "8443")),
+            url_path=BOT_TOKEN,
+            webhook_url=f"{webhook_url.rstrip('/')}/{BOT_TOKEN}",
+        )
+    else:
+        app.run_polling()
+
+if __name__ == "__main__":
+    main()
+
+
+
+
+    ##
+
+
+
+
+